@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Seraina Betschart
+# date: 01.12.2024
+# Bachelor Thesis
+# Detecting Semantic Shift with Word Embeddings
+
+import os
+import json
+import time
+import numpy as np
+from model_registry import get_vectors
+from cosine_engine import blocked_top_k_neighbors, get_rows
+
+
+def nearest_centroids(vectors, centroids, n=1, block_size=4096):
+    """
+    Returns for every vector the indices of its n closest centroids (highest cosine, unsorted), block by block.
+    """
+    closest = np.empty((len(vectors), n), dtype=np.int64)
+    for start in range(0, len(vectors), block_size):
+        scores = np.asarray(vectors[start:start + block_size]).dot(centroids.T)
+        if n == 1:
+            closest[start:start + len(scores), 0] = scores.argmax(axis=1)
+        else:
+            closest[start:start + len(scores)] = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+    return closest
+
+
+def spherical_kmeans(vectors, n_clusters, n_iterations=10, sample_size=100000, seed=42):
+    """
+    Clusters normalized vectors by cosine similarity (k-means with the centroids projected back onto the unit sphere).
+    The centroids are trained on a random sample of at most sample_size vectors.
+    """
+    rng = np.random.default_rng(seed)
+    sample = np.asarray(vectors[rng.choice(len(vectors), size=min(sample_size, len(vectors)), replace=False)])
+    centroids = sample[rng.choice(len(sample), size=n_clusters, replace=False)].copy()
+
+    for _ in range(n_iterations):
+        assignment = nearest_centroids(sample, centroids)[:, 0]
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        empty = np.bincount(assignment, minlength=n_clusters) == 0
+        sums[empty] = sample[rng.choice(len(sample), size=empty.sum(), replace=False)]  # restart empty clusters
+        centroids = sums / np.linalg.norm(sums, axis=1, keepdims=True)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted file index over the normalized vectors of one model: the vectors are clustered, and a query is only
+    compared with the vectors of the n_probe clusters whose centroids are closest to it instead of the whole vocabulary.
+    """
+    def __init__(self, kv, centroids, list_offsets, list_rows):
+        self.kv = kv
+        self.centroids = centroids
+        self.list_offsets = list_offsets  # the rows of cluster c are list_rows[list_offsets[c]:list_offsets[c + 1]]
+        self.list_rows = list_rows
+        # vectors in cluster order (as stored, also if quantized), so each cluster is one contiguous block
+        self.list_vectors = np.asarray(kv.vectors[list_rows])
+        self.list_scale = kv.expandos["scale"][list_rows] if "scale" in kv.expandos else None
+
+    def search(self, query_vectors, k=10, n_probe=8, exclude=None):
+        """
+        Returns the row indices and cosine similarities of the (approximately) k most similar vectors of every query.
+        If exclude is set, row exclude[i] (the query word itself) is skipped.
+        """
+        probes = nearest_centroids(query_vectors, self.centroids, min(n_probe, len(self.centroids)))
+        results = []
+        for i, query in enumerate(np.asarray(query_vectors)):
+            blocks = [np.arange(self.list_offsets[c], self.list_offsets[c + 1]) for c in probes[i]]
+            candidates = np.concatenate(blocks)
+            scores = self.list_vectors[candidates].astype(np.float32).dot(query)
+            if self.list_scale is not None:
+                scores *= self.list_scale[candidates]
+            rows = self.list_rows[candidates]
+            if exclude is not None:
+                scores[rows == exclude[i]] = -np.inf
+            top = min(k, len(scores))
+            if top == 0:
+                results.append((rows, scores))
+                continue
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            results.append((rows[best], scores[best]))
+        return results
+
+    def most_similar(self, word, topn=10, n_probe=8):
+        """
+        Same as most_similar of the gensim vectors: returns the topn closest words as (word, similarity).
+        """
+        row = self.kv.key_to_index[word]
+        rows, scores = self.search(get_rows(self.kv, [row]), topn, n_probe, exclude=[row])[0]
+        return [(self.kv.index_to_key[r], float(s)) for r, s in zip(rows, scores)]
+
+
+def build_ivf_index(kv, n_lists=None, n_iterations=10, seed=42):
+    """
+    Builds an IVF index over the vectors of a model. By default the number of clusters is 4 * sqrt(vocabulary size).
+    """
+    if n_lists is None:
+        n_lists = int(4 * np.sqrt(len(kv.index_to_key)))
+    vectors = get_rows(kv, slice(None))
+    centroids = spherical_kmeans(vectors, n_lists, n_iterations=n_iterations, seed=seed)
+    assignment = nearest_centroids(vectors, centroids)[:, 0]
+    list_rows = np.argsort(assignment, kind="stable")
+    list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=n_lists))])
+    return IVFIndex(kv, centroids, list_offsets, list_rows)
+
+
+def index_path(vectors_file):
+    """
+    Returns the path of the index file belonging to a vector file (.kv or alignment .npz).
+    """
+    return f"{os.path.splitext(vectors_file)[0]}.ivf.npz"
+
+
+def save_ivf_index(index, output_file):
+    """
+    Saves the clusters of an index (not the vectors themselves).
+    """
+    np.savez(output_file, centroids=index.centroids, list_offsets=index.list_offsets, list_rows=index.list_rows)
+
+
+def get_ivf_index(vectors_file, n_lists=None):
+    """
+    Returns the index of a vector file: it is loaded if it was saved before and is newer than the vectors, otherwise it
+    is built and saved.
+    """
+    kv = get_vectors(vectors_file)
+    output_file = index_path(vectors_file)
+    if os.path.exists(output_file) and os.path.getmtime(output_file) >= os.path.getmtime(vectors_file):
+        with np.load(output_file) as data:
+            return IVFIndex(kv, data["centroids"], data["list_offsets"], data["list_rows"])
+
+    start = time.perf_counter()
+    index = build_ivf_index(kv, n_lists=n_lists)
+    save_ivf_index(index, output_file)
+    print(f"Built index with {len(index.centroids)} clusters for {vectors_file} "
+          f"in {round(time.perf_counter() - start, 2)} s.")
+    return index
+
+
+def recall_report(vectors_file, k=10, n_probes=(1, 2, 4, 8, 16, 32), n_queries=1000, seed=42,
+                  output_dir="../results/benchmarks"):
+    """
+    Compares the index with the exact neighbor search for a random sample of query words: recall@k (share of the exact
+    k nearest neighbors which are found) and queries per second for each number of probed clusters.
+    The report is printed and saved as json.
+    """
+    index = get_ivf_index(vectors_file)
+    kv = index.kv
+    rng = np.random.default_rng(seed)
+    queries = rng.choice(len(kv.index_to_key), size=min(n_queries, len(kv.index_to_key)), replace=False)
+    query_vectors = get_rows(kv, queries)
+
+    start = time.perf_counter()
+    exact = blocked_top_k_neighbors(query_vectors, kv, k, query_indices=queries)
+    report = {"vectors": os.path.basename(vectors_file), "vocabulary": len(kv.index_to_key),
+              "clusters": len(index.centroids), "k": k, "queries": len(queries),
+              "exact_queries_per_second": round(len(queries) / (time.perf_counter() - start), 1), "ann": []}
+
+    for n_probe in n_probes:
+        start = time.perf_counter()
+        results = index.search(query_vectors, k, n_probe, exclude=queries)
+        seconds = time.perf_counter() - start
+        found = [len(np.intersect1d(rows, exact[i])) for i, (rows, scores) in enumerate(results)]
+        report["ann"].append({"n_probe": n_probe, "recall_at_k": round(sum(found) / exact.size, 4),
+                              "queries_per_second": round(len(queries) / seconds, 1)})
+        print(f"n_probe {n_probe}: recall@{k} {report['ann'][-1]['recall_at_k']}, "
+              f"{report['ann'][-1]['queries_per_second']} queries/s "
+              f"(exact: {report['exact_queries_per_second']} queries/s)")
+
+    if not os.path.exists(output_dir):  # check if the folder exists, else create it
+        os.makedirs(output_dir)
+    name = os.path.splitext(os.path.basename(vectors_file))[0]
+    with open(os.path.join(output_dir, f"ann_recall_{name}.json"), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=4)
+    return report
+
+
+if __name__ == '__main__':
+
+    languages = ["en", "fr", "es"]
+    periods = ["old", "new"]
+    model_suffix = "vec300_win10_mc5_ep5"
+
+    for lang in languages:
+        for period in periods:
+            recall_report(f"../models/model_{lang}-{period}_{model_suffix}.kv")
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Seraina Betschart
+# date: 01.12.2024
+# Bachelor Thesis
+# Detecting Semantic Shift with Word Embeddings
+
+import os
+import json
+import time
+import numpy as np
+from vector_store import build_keyed_vectors, load_vectors, dequantize_rows
+from procrustes_align import (shared_vocabulary_indices, procrustes_rotation, intersection_align_gensim,
+                              smart_procrustes_align_gensim)
+from training_callbacks import machine_info, peak_rss_mb
+
+
+def random_rotation(vector_dim, rng):
+    """
+    Returns a random orthogonal matrix (QR decomposition of a Gaussian matrix).
+    """
+    q, r = np.linalg.qr(rng.standard_normal((vector_dim, vector_dim)))
+    return (q * np.sign(np.diag(r))).astype(np.float32)
+
+
+def synthetic_model_pair(vocab_size, vector_dim, overlap=0.8, noise=0.05, seed=42):
+    """
+    Creates two random models with a known relation: the second model is the first one rotated by a random orthogonal
+    matrix plus Gaussian noise, its vocabulary is shuffled and only the given proportion of words is shared.
+    Returns both KeyedVectors (normalized vectors) and the rotation which maps the second model back onto the first.
+    """
+    rng = np.random.default_rng(seed)
+    shared = int(vocab_size * overlap)
+    base_vectors = rng.standard_normal((vocab_size, vector_dim), dtype=np.float32)
+    base_vectors /= np.linalg.norm(base_vectors, axis=1, keepdims=True)
+    rotation = random_rotation(vector_dim, rng)
+
+    other_vectors = base_vectors.dot(rotation) + noise * rng.standard_normal((vocab_size, vector_dim), dtype=np.float32)
+    other_vectors /= np.linalg.norm(other_vectors, axis=1, keepdims=True)
+    other_words = [f"word{i}" for i in range(shared)] + [f"other{i}" for i in range(vocab_size - shared)]
+    order = rng.permutation(vocab_size)
+
+    counts = rng.integers(5, 10000, vocab_size)
+    base_kv = build_keyed_vectors([f"word{i}" for i in range(vocab_size)], base_vectors, counts)
+    other_kv = build_keyed_vectors([other_words[i] for i in order], other_vectors[order], counts[order])
+    return base_kv, other_kv, rotation.T
+
+
+def benchmark_intersection(vocab_sizes=(100000, 200000), vector_dim=300, overlap=0.8, seed=42):
+    """
+    Times the vocabulary intersection and the full alignment on random models with large vocabularies.
+    The two random vocabularies (see synthetic_model_pair) share the given proportion of words and are in different
+    orders.
+    """
+    for vocab_size in vocab_sizes:
+        base_kv, other_kv, _ = synthetic_model_pair(vocab_size, vector_dim, overlap=overlap, seed=seed)
+
+        start = time.perf_counter()
+        in_base, in_other = intersection_align_gensim(base_kv, other_kv)
+        intersection_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        smart_procrustes_align_gensim(base_kv, other_kv)
+        alignment_seconds = time.perf_counter() - start
+
+        print(f"vocab size {vocab_size}, {len(in_base.index_to_key)} shared words: "
+              f"intersection {round(intersection_seconds, 3)} s, full alignment {round(alignment_seconds, 3)} s")
+
+
+def best_time(function, repeats):
+    """
+    Runs the function several times and returns the fastest run time and the result of the last run.
+    """
+    times = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def benchmark_alignment(base_kv, other_kv, true_rotation=None, repeats=3, sample_size=1000, seed=42):
+    """
+    Times the three steps of the alignment (vocabulary intersection, SVD, rotation of the whole matrix) and measures
+    the alignment quality:
+    - residual: root mean squared distance between the rotated and the base vectors of the shared words
+    - anchor_top1: share of (sampled) shared words whose closest base vector after rotation is the same word
+    - anchor_stability: difference between the rotations fitted on two disjoint random halves of the shared words
+    - rotation_error: difference to the known rotation (synthetic models only)
+    """
+    rng = np.random.default_rng(seed)
+    intersection_seconds, (shared_vocab, base_indices, other_indices) = best_time(
+        lambda: shared_vocabulary_indices(base_kv, other_kv), repeats)
+    base_vecs = dequantize_rows(base_kv, base_indices)
+    other_vecs = dequantize_rows(other_kv, other_indices)
+
+    svd_seconds, ortho = best_time(lambda: procrustes_rotation(base_vecs, other_vecs), repeats)
+    rotation_seconds, _ = best_time(lambda: dequantize_rows(other_kv, slice(None)).dot(ortho), repeats)
+
+    rotated = other_vecs.dot(ortho)
+    sample = rng.choice(len(shared_vocab), size=min(sample_size, len(shared_vocab)), replace=False)
+    closest = rotated[sample].dot(base_vecs.T).argmax(axis=1)
+
+    halves = rng.permutation(len(shared_vocab))
+    first, second = halves[:len(halves) // 2], halves[len(halves) // 2:]
+    ortho_first = procrustes_rotation(base_vecs[first], other_vecs[first])
+    ortho_second = procrustes_rotation(base_vecs[second], other_vecs[second])
+    vector_dim = base_vecs.shape[1]
+
+    results = {"shared_words": len(shared_vocab),
+               "intersection_seconds": round(intersection_seconds, 5),
+               "svd_seconds": round(svd_seconds, 5),
+               "rotation_seconds": round(rotation_seconds, 5),
+               "residual": float(np.linalg.norm(rotated - base_vecs) / np.sqrt(len(shared_vocab))),
+               "anchor_top1": float((closest == sample).mean()),
+               "anchor_stability": float(np.linalg.norm(ortho_first - ortho_second) / np.sqrt(vector_dim))}
+    if true_rotation is not None:
+        results["rotation_error"] = float(np.linalg.norm(ortho - true_rotation) / np.sqrt(vector_dim))
+    return results
+
+
+def write_result(record, output_file):
+    """
+    Appends one benchmark result as JSON line, so results of several runs can be tracked over time.
+    """
+    if not os.path.exists(os.path.dirname(output_file)):  # check if the folder exists, else create it
+        os.makedirs(os.path.dirname(output_file))
+    with open(output_file, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def run_benchmarks(vocab_sizes=(10000, 50000, 100000), vector_dims=(100, 300), languages=("es", "fr", "en"),
+                   model_suffix="vec300_win10_mc5_ep5", output_file="../results/benchmarks/alignment_benchmark.jsonl"):
+    """
+    Runs the benchmark on synthetic models of all given sizes and on the real models of each language (old aligned to
+    new), if they exist, and appends every result to the output file.
+    """
+    run_info = {"date": time.strftime("%Y-%m-%d %H:%M:%S"), "machine": machine_info()}
+
+    for vocab_size in vocab_sizes:
+        for vector_dim in vector_dims:
+            base_kv, other_kv, true_rotation = synthetic_model_pair(vocab_size, vector_dim)
+            results = benchmark_alignment(base_kv, other_kv, true_rotation)
+            record = {**run_info, "case": "synthetic", "vocab_size": vocab_size, "vector_dim": vector_dim,
+                      **results, "peak_rss_mb": peak_rss_mb()}
+            write_result(record, output_file)
+            print(f"synthetic {vocab_size} x {vector_dim}: {results}")
+
+    for lang in languages:
+        base_file = f"../models/model_{lang}-new_{model_suffix}.kv"
+        other_file = f"../models/model_{lang}-old_{model_suffix}.kv"
+        if os.path.exists(base_file) and os.path.exists(other_file):
+            base_kv = load_vectors(base_file)
+            other_kv = load_vectors(other_file)
+            results = benchmark_alignment(base_kv, other_kv)
+            record = {**run_info, "case": f"{lang}-old to {lang}-new", "vocab_size": len(other_kv.index_to_key),
+                      "vector_dim": other_kv.vector_size, **results, "peak_rss_mb": peak_rss_mb()}
+            write_result(record, output_file)
+            print(f"{lang}: {results}")
+
+
+if __name__ == '__main__':
+
+    run_benchmarks()
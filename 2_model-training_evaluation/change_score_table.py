@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Seraina Betschart
+# date: 01.12.2024
+# Bachelor Thesis
+# Detecting Semantic Shift with Word Embeddings
+
+import os
+import numpy as np
+from model_registry import get_vectors
+from cosine_engine import rowwise_cosine, get_rows, knn_overlap
+from procrustes_align import shared_vocabulary_indices
+from vector_store import get_counts
+
+
+def change_table_path(lang, model_suffix="vec300_win10_mc5_ep5"):
+    """
+    Returns the path of the change score table of one language.
+    """
+    return f"../results/change_scores/change_scores_{lang}_{model_suffix}.npz"
+
+
+def build_change_table(m1, m2, output_file, neighbor_k=None, block_size=None):
+    """
+    Computes the change scores of the whole shared vocabulary of two aligned models (.kv or alignment .npz) once and
+    saves them column by column (compressed .npz), sorted by word:
+    - word, pos (the part after the last "_" of the word)
+    - cosine: cosine similarity of the word between the two models
+    - knn_overlap: Jaccard overlap of the neighbor_k nearest neighbors of the word in both models (only if neighbor_k
+      is set, as the neighbor search over the whole vocabulary takes much longer than the cosine scores)
+    - count1, count2: frequency of the word in the corpus of each model
+    """
+    model1 = get_vectors(m1)
+    model2 = get_vectors(m2)
+    shared_vocab, indices1, indices2 = shared_vocabulary_indices(model1, model2)
+    scores = rowwise_cosine(get_rows(model1, indices1), get_rows(model2, indices2))
+
+    words = np.array(shared_vocab)
+    order = np.argsort(words)
+    words = words[order]
+    columns = {"word": words,
+               "pos": np.char.rpartition(words, "_")[:, 2],
+               "cosine": scores[order].astype(np.float32),
+               "count1": get_counts(model1)[indices1][order],
+               "count2": get_counts(model2)[indices2][order],
+               "model1": os.path.basename(m1),
+               "model2": os.path.basename(m2)}
+    if neighbor_k:
+        overlaps = knn_overlap(model1, model2, k=neighbor_k, block_size=block_size)[1]
+        columns["knn_overlap"] = overlaps[order].astype(np.float32)
+        columns["neighbor_k"] = neighbor_k
+
+    if not os.path.exists(os.path.dirname(output_file)):  # check if the folder exists, else create it
+        os.makedirs(os.path.dirname(output_file))
+    np.savez_compressed(output_file, **columns)
+    print(f"Saved change scores of {len(words)} words to {output_file}")
+
+
+def load_change_table(table_file):
+    """
+    Loads a change score table as dictionary column name -> array.
+    """
+    with np.load(table_file) as data:
+        return {column: data[column] for column in data.files}
+
+
+def filter_change_table(table, pos_tags=None, exclude_pos=None, min_count=None):
+    """
+    Returns the rows of the table with one of the given POS tags, none of the excluded POS tags and at least min_count
+    occurrences in both corpora.
+    """
+    keep = np.ones(len(table["word"]), dtype=bool)
+    if pos_tags:
+        keep &= np.isin(table["pos"], pos_tags)
+    if exclude_pos:
+        keep &= ~np.isin(table["pos"], exclude_pos)
+    if min_count:
+        keep &= np.minimum(table["count1"], table["count2"]) >= min_count
+    return {column: values[keep] if values.ndim else values for column, values in table.items()}
+
+
+def lookup_scores(table, words):
+    """
+    Looks up the cosine scores of a list of words in the table (binary search in the sorted word column).
+    Returns the scored words, their scores (array in the same order) and the words which are not in the table.
+    """
+    words = np.array(words, dtype=str)
+    if len(table["word"]) == 0:
+        return [], np.array([], dtype=np.float32), list(words)
+    positions = np.searchsorted(table["word"], words).clip(max=len(table["word"]) - 1)
+    found = table["word"][positions] == words
+    return list(words[found]), table["cosine"][positions[found]], list(words[~found])
+
+
+if __name__ == '__main__':
+
+    languages = ["en", "fr", "es"]
+    model_suffix = "vec300_win10_mc5_ep5"
+    neighbor_k = None  # e.g. 10 to also save the knn_overlap column (needed for rank_full_vocabulary with knn_overlap)
+
+    for lang in languages:
+        build_change_table(f"../models/model_{lang}-new_{model_suffix}.kv",
+                           f"../models/aligned_model_{lang}-old_{model_suffix}.npz",
+                           change_table_path(lang, model_suffix), neighbor_k=neighbor_k)
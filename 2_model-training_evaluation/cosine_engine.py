@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Seraina Betschart
+# date: 01.12.2024
+# Bachelor Thesis
+# Detecting Semantic Shift with Word Embeddings
+
+import numpy as np
+from procrustes_align import shared_vocabulary_indices
+from vector_store import dequantize_rows
+
+
+def word_indices(kv, words):
+    """
+    Returns the row index of every word in the vectors, -1 for words which are not in the vocabulary.
+    """
+    return np.array([kv.key_to_index.get(word, -1) for word in words], dtype=np.int64)
+
+
+def get_rows(kv, indices):
+    """
+    Returns the vectors of the given rows as (in-memory) float32 array, quantized vectors are converted back.
+    """
+    return dequantize_rows(kv, indices)
+
+
+def dot_all(query_vectors, kv, chunk_size=50000):
+    """
+    Dot products of the query vectors with every vector of kv, shape (queries, vocabulary). Quantized vectors are
+    converted chunk by chunk, so the whole float32 matrix is never built.
+    """
+    if kv.vectors.dtype == np.float32:
+        return query_vectors.dot(np.asarray(kv.vectors).T)
+    scores = np.empty((len(query_vectors), len(kv.index_to_key)), dtype=np.float32)
+    for start in range(0, len(kv.index_to_key), chunk_size):
+        scores[:, start:start + chunk_size] = query_vectors.dot(get_rows(kv, slice(start, start + chunk_size)).T)
+    return scores
+
+
+def rowwise_cosine(vectors1, vectors2, normalized=True):
+    """
+    Cosine similarity between row i of vectors1 and row i of vectors2 for all rows at once.
+    With normalized=True the rows are expected to have unit length already (as in the exported .kv vectors and the
+    aligned vectors), so the cosine is just the row-wise dot product.
+    """
+    dots = np.einsum("ij,ij->i", vectors1, vectors2)
+    if not normalized:
+        dots /= np.linalg.norm(vectors1, axis=1) * np.linalg.norm(vectors2, axis=1)
+    return dots
+
+
+def top_k_indices(scores, k, largest=False):
+    """
+    Returns the indices of the k smallest (or largest) scores, sorted. Only these k entries are sorted, the selection
+    itself is a partial partition (argpartition) instead of a full sort of all scores.
+    """
+    k = min(k, len(scores))
+    if k == 0:
+        return np.array([], dtype=np.int64)
+    keys = -scores if largest else scores
+    selected = np.argpartition(keys, k - 1)[:k]
+    return selected[np.argsort(keys[selected])]
+
+
+def blocked_top_k_neighbors(query_vectors, vectors, k, block_size=None, query_indices=None,
+                            memory_budget=256 * 1024 ** 2):
+    """
+    Returns for every query vector the row indices of its k most similar vectors (most similar first).
+    vectors can be an array or KeyedVectors (also quantized ones).
+    The similarities are computed for block_size queries at a time, so the full similarity matrix is never built.
+    If block_size is None, it is chosen so that the scores (float32) and the argpartition result (int64) of one block
+    take about memory_budget bytes.
+    If query_indices is set, row query_indices[i] of vectors (the query word itself) is not counted as neighbor.
+    """
+    if hasattr(vectors, "key_to_index"):
+        similarities = lambda queries: dot_all(queries, vectors)
+    else:
+        similarities = lambda queries: queries.dot(vectors.T)
+    k = min(k, len(vectors) - (query_indices is not None))
+    if block_size is None:
+        block_size = max(1, memory_budget // (len(vectors) * 12))
+    neighbors = np.empty((len(query_vectors), k), dtype=np.int64)
+    for start in range(0, len(query_vectors), block_size):
+        scores = similarities(np.asarray(query_vectors[start:start + block_size]))
+        if query_indices is not None:
+            scores[np.arange(len(scores)), query_indices[start:start + block_size]] = -np.inf
+        # the k largest scores are at the end of the partition (no negated copy of the score block needed)
+        best = np.argpartition(scores, scores.shape[1] - k, axis=1)[:, -k:]
+        order = np.argsort(-np.take_along_axis(scores, best, axis=1), axis=1)
+        neighbors[start:start + len(scores)] = np.take_along_axis(best, order, axis=1)
+    return neighbors
+
+
+def neighbor_overlap(neighbors1, neighbors2):
+    """
+    Jaccard overlap between the neighbor sets of row i of neighbors1 and row i of neighbors2, for all rows at once.
+    """
+    merged = np.sort(np.concatenate([neighbors1, neighbors2], axis=1), axis=1)
+    shared = (merged[:, 1:] == merged[:, :-1]).sum(axis=1)
+    return shared / (neighbors1.shape[1] + neighbors2.shape[1] - shared)
+
+
+def knn_overlap(kv1, kv2, words=None, k=10, block_size=None):
+    """
+    Second change measure: the Jaccard overlap of the k nearest neighbors of a word in both vector sets (1 = same
+    neighbors, 0 = no neighbor in common). Neighbors are only searched in the shared vocabulary, so that the neighbors
+    of both models are comparable; as only similarities within one model are used, the models need not be aligned.
+    Returns the scored words (all shared words if words is None), their overlaps and the out-of-vocabulary words.
+    """
+    shared_vocab, indices1, indices2 = shared_vocabulary_indices(kv1, kv2)
+    vectors1 = get_rows(kv1, indices1)
+    vectors2 = get_rows(kv2, indices2)
+
+    if words is None:
+        scored_words, queries, oov_words = shared_vocab, np.arange(len(shared_vocab)), []
+    else:
+        position = {word: i for i, word in enumerate(shared_vocab)}
+        scored_words = [word for word in words if word in position]
+        oov_words = [word for word in words if word not in position]
+        queries = np.array([position[word] for word in scored_words], dtype=np.int64)
+
+    neighbors1 = blocked_top_k_neighbors(vectors1[queries], vectors1, k, block_size, query_indices=queries)
+    neighbors2 = blocked_top_k_neighbors(vectors2[queries], vectors2, k, block_size, query_indices=queries)
+    return scored_words, neighbor_overlap(neighbors1, neighbors2), oov_words
+
+
+def print_oov_words(oov_words):
+    """
+    Prints the words which could not be scored because they are missing in one of the models.
+    """
+    if oov_words:
+        print(f"{len(oov_words)} words are not in both models and were skipped: {', '.join(oov_words)}")
@@ -6,8 +6,8 @@
 # Detecting Semantic Shift with Word Embeddings
 
 import sys
-import gensim
-import numpy as np
+from cosine_engine import print_oov_words
+from change_score_table import change_table_path, load_change_table, lookup_scores
 
 
 def txt_to_list(txt_file):
@@ -47,23 +47,16 @@ def txt_to_list_cognates(txt_file, lang):
     return word_list
 
 
-def find_cosine_similarity(m1, m2, word_list, print_=True):
+def find_cosine_similarity(table_file, word_list, print_=True):
     """
-    Give paths to two aligned embedding models, a list of words as input.
-    The function gets the embeddings for each word from the two models, calculates the cosine distance
-    and returns the scores in a list. Optionally, also print results.
+    Give the path to the change score table of two aligned embedding models (see change_score_table.py), a list of
+    words as input.
+    The function looks up the cosine distance of each word between the two models and returns the scores in a list
+    (words missing in one of the models are skipped). Optionally, also print results.
     """
-    cosine_list = []
-    scores_list = []
-    model1 = gensim.models.Word2Vec.load(m1)
-    model2 = gensim.models.Word2Vec.load(m2)
-    for word in word_list:
-        vector1 = model1.wv[word]
-        vector2 = model2.wv[word]
-        cosine_similarity = np.dot(vector1, vector2) / (
-                np.linalg.norm(vector1) * np.linalg.norm(vector2))
-        cosine_list.append([cosine_similarity, word])
-        scores_list.append(cosine_similarity)
+    scored_words, scores, oov_words = lookup_scores(load_change_table(table_file), word_list)
+    print_oov_words(oov_words)
+    cosine_list = [[score, word] for score, word in zip(scores, scored_words)]
 
     if print_:
         cos_list_copy=cosine_list[:]
@@ -88,29 +81,29 @@ def compare_cosine_in_cognate_list(input_words, output_file="print"):
     lang_list = ["en", "fr", "es"]
     output_list = []
     for lang in lang_list:
-        embedding_model_base = f"../models/model_{lang}-new_vec300_win10_mc5_ep5"
-        embedding_model_aligned = f"../models/aligned_model_{lang}-old_vec300_win10_mc5_ep5"
+        change_table = change_table_path(lang, "vec300_win10_mc5_ep5")
         target_words = txt_to_list_cognates(input_words, lang)
-        cosine_list = find_cosine_similarity(embedding_model_base, embedding_model_aligned, target_words, print_=False)
-        output_list.append(cosine_list)
-        cosine_list.sort()
+        cosine_list = find_cosine_similarity(change_table, target_words, print_=False)
+        # look up the scores by word, so the cognates stay on the same line even if a word is missing in a model
+        output_list.append({word: score for score, word in cosine_list})
         print(f"\n{lang}\n")
-        for ele in cosine_list:
+        for ele in sorted(cosine_list):
             print(f"{ele[1]}\t{ele[0]}")
 
 
     lat_words = txt_to_list_cognates(input_words, "lat")
+    cognate_words = [txt_to_list_cognates(input_words, lang) for lang in lang_list]
     output_sorted_by_word = []
     output_sorted_by_word_rounded = []
     output_sorted_by_word.append(f"Latin word\tEnglish word\tEnglish score\tFrench word\tFrench score\t"
                                  f"Spanish word\tSpanish score")
     for i, word in enumerate(lat_words):
-        en_word = output_list[0][i][1]
-        en_score = output_list[0][i][0]
-        fr_word = output_list[1][i][1]
-        fr_score = output_list[1][i][0]
-        es_word = output_list[2][i][1]
-        es_score = output_list[2][i][0]
+        en_word = cognate_words[0][i]
+        en_score = output_list[0].get(en_word, float("nan"))
+        fr_word = cognate_words[1][i]
+        fr_score = output_list[1].get(fr_word, float("nan"))
+        es_word = cognate_words[2][i]
+        es_score = output_list[2].get(es_word, float("nan"))
         output_sorted_by_word.append(f"{word}\t{en_word}\t{en_score}\t{fr_word}\t{fr_score}\t{es_word}\t{es_score}\t\n")
         output_sorted_by_word_rounded.append(f"{word}\t{en_word}\t{round(float(en_score), 3)}\t"
                                              f"{fr_word}\t{round(float(fr_score), 3)}\t{es_word}\t"
@@ -125,17 +118,17 @@ def compare_cosine_in_cognate_list(input_words, output_file="print"):
                 file.write(line)
 
 
-def calc_cosine_distance_of_top_words(input_words, m1, m2, output_file="print"):
+def calc_cosine_distance_of_top_words(input_words, table_file, output_file="print"):
     """
-    Input: Text file containing a list of words, two aligned models, optionally an output file.
+    Input: Text file with a list of words, the change score table of two aligned models, optionally an output file.
 
     Calculate cosine distance between vectors of the models for each word and print/save to output file.
     """
     wordlist = txt_to_list(input_words)
     if output_file == "print":
-        find_cosine_similarity(m1, m2, wordlist)
+        find_cosine_similarity(table_file, wordlist)
     else:
-        cosine_scores = find_cosine_similarity(m1, m2, wordlist)
+        cosine_scores = find_cosine_similarity(table_file, wordlist)
         cosine_scores.sort()
         with open(output_file, 'w', encoding='utf-8') as file:
             for ele in cosine_scores:
@@ -157,9 +150,8 @@ if __name__ == '__main__':
 
     if top_list:
         lang = "en"
-        embedding_model_base = f"../models/model_{lang}-new_vec300_win10_mc5_ep5"
-        embedding_model_aligned = f"../models/aligned_model_{lang}-old_vec300_win10_mc5_ep5"
+        change_table = change_table_path(lang, "vec300_win10_mc5_ep5")
         input_words = f'../word_lists/top_words_{lang}_with-pos_only-content.txt'
         output_file = f"../results/top_words_{lang}_cosine_distance.txt"
-        calc_cosine_distance_of_top_words(input_words, embedding_model_base, embedding_model_aligned, output_file)
+        calc_cosine_distance_of_top_words(input_words, change_table, output_file)
 
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Seraina Betschart
+# date: 01.12.2024
+# Bachelor Thesis
+# Detecting Semantic Shift with Word Embeddings
+
+import os
+import json
+import numpy as np
+from vector_store import load_alignment, dequantize_rows
+from model_registry import get_vectors
+from procrustes_align import procrustes_rotation
+
+# column of each language in the cognate list files: en, lat, fr, es
+COGNATE_COLUMNS = {"en": 0, "lat": 1, "fr": 2, "es": 3}
+
+
+def read_cognate_list(cognate_file):
+    """
+    Returns the cognate sets of a cognate list file as list of dictionaries (language -> word).
+    """
+    cognates = []
+    with open(cognate_file, 'r', encoding='utf-8') as file:
+        for line in file:
+            columns = line.replace("\n", "").split("\t")
+            if len(columns) >= 4:
+                cognates.append({lang: columns[index].strip() for lang, index in COGNATE_COLUMNS.items()})
+    return cognates
+
+
+def fit_crosslingual_rotation(source_kv, target_kv, cognates, source_lang, target_lang, output=None, n_folds=10,
+                              seed=42):
+    """
+    Uses the cognate sets as bilingual seed dictionary: the rotation which maps the source language vectors of the
+    seed words onto the target language vectors of their cognates is computed with orthogonal Procrustes.
+    Seed pairs with a word missing in one of the models are skipped.
+    As the seed pairs are also the words which are compared afterwards, the rotation is fitted again n_folds times
+    (k-fold cross-validation), each time without one fold of the seed pairs; every seed pair is scored with the rotation
+    of its own fold, which did not see it (held-out diagnostics).
+    If output is set, the rotation and the fold rotations are saved (output + ".npz") together with diagnostics
+    (output + ".json").
+    """
+    seeds = [(cognate[source_lang], cognate[target_lang]) for cognate in cognates
+             if cognate[source_lang] in source_kv.key_to_index and cognate[target_lang] in target_kv.key_to_index]
+    source_indices = np.array([source_kv.key_to_index[source] for source, target in seeds])
+    target_indices = np.array([target_kv.key_to_index[target] for source, target in seeds])
+
+    # the exported vectors are already normalized
+    source_vecs = dequantize_rows(source_kv, source_indices)
+    target_vecs = dequantize_rows(target_kv, target_indices)
+    ortho = procrustes_rotation(target_vecs, source_vecs)
+
+    # k-fold rotations: every seed pair belongs to one fold and is scored with the rotation fitted on the other folds
+    n_folds = min(n_folds, len(seeds))
+    folds = np.random.default_rng(seed).permutation(len(seeds)) % n_folds
+    fold_orthos = np.empty((n_folds, ortho.shape[0], ortho.shape[1]), dtype=np.float32)
+    heldout_similarities = np.empty((len(seeds), len(seeds)), dtype=np.float32)
+    for fold in range(n_folds):
+        test = folds == fold
+        fold_orthos[fold] = procrustes_rotation(target_vecs[~test], source_vecs[~test])
+        heldout_similarities[test] = source_vecs[test].dot(fold_orthos[fold]).dot(target_vecs.T)
+
+    # diagnostics: similarity of the seed pairs after rotation and how often the cognate is the closest seed word,
+    # once with the rotation fitted on all pairs (training fit) and once held-out
+    similarities = source_vecs.dot(ortho).dot(target_vecs.T)
+    diagnostics = {"source_lang": source_lang,
+                   "target_lang": target_lang,
+                   "seed_pairs": len(seeds),
+                   "skipped_pairs": len(cognates) - len(seeds),
+                   "mean_cosine_seed_pairs": float(np.diag(similarities).mean()),
+                   "seed_precision_at_1": float((similarities.argmax(axis=1) == np.arange(len(seeds))).mean()),
+                   "n_folds": n_folds,
+                   "heldout_mean_cosine_seed_pairs": float(np.diag(heldout_similarities).mean()),
+                   "heldout_precision_at_1": float((heldout_similarities.argmax(axis=1) ==
+                                                    np.arange(len(seeds))).mean())}
+
+    if output is not None:
+        np.savez(f"{output}.npz", ortho=ortho, source_words=np.array([source for source, target in seeds]),
+                 target_words=np.array([target for source, target in seeds]), folds=folds, fold_orthos=fold_orthos)
+        with open(f"{output}.json", 'w', encoding='utf-8') as f:
+            json.dump(diagnostics, f, indent=4)
+    print(f"{source_lang} -> {target_lang}: {len(seeds)} seed pairs, "
+          f"mean cosine {round(diagnostics['mean_cosine_seed_pairs'], 3)}, "
+          f"precision@1 {round(diagnostics['seed_precision_at_1'], 3)} (held-out: mean cosine "
+          f"{round(diagnostics['heldout_mean_cosine_seed_pairs'], 3)}, "
+          f"precision@1 {round(diagnostics['heldout_precision_at_1'], 3)})")
+    return ortho
+
+
+def heldout_rotations(rotation_file):
+    """
+    Returns the fold rotations of a saved cross-lingual rotation and the fold of every seed word (source language), as
+    used by stack_cognate_vectors.
+    """
+    alignment = load_alignment(rotation_file)
+    return alignment["fold_orthos"], dict(zip(alignment["source_words"], alignment["folds"]))
+
+
+def stack_cognate_vectors(cognates, spaces, languages, periods, heldout=None):
+    """
+    Collects the vectors of all cognate sets which are complete in every language and period into one array of shape
+    (periods, languages, cognate sets, dimensions), already rotated into the shared space.
+    spaces: dictionary (lang, period) -> (vectors, rotation into the shared space).
+    heldout: optional dictionary lang -> (fold rotations, seed word -> fold), see heldout_rotations(). The words of a
+    seed pair are then rotated with the rotation of their fold, which was fitted without them; other words with the
+    rotation of spaces.
+    Returns the array and the list of the used cognate sets.
+    """
+    complete = [cognate for cognate in cognates
+                if all(cognate[lang] in spaces[(lang, period)][0].key_to_index
+                       for lang in languages for period in periods)]
+    stacked = np.empty((len(periods), len(languages), len(complete), spaces[(languages[0], periods[0])][0].vector_size),
+                       dtype=np.float32)
+    for p, period in enumerate(periods):
+        for l, lang in enumerate(languages):
+            kv, rotation = spaces[(lang, period)]
+            indices = [kv.key_to_index[cognate[lang]] for cognate in complete]
+            rows = dequantize_rows(kv, indices)
+            if heldout is None or lang not in heldout:
+                stacked[p, l] = rows.dot(rotation)
+                continue
+            fold_orthos, word_folds = heldout[lang]
+            folds = np.array([word_folds.get(cognate[lang], -1) for cognate in complete])
+            stacked[p, l] = rows.dot(rotation)  # words which were no seed pair
+            for fold in np.unique(folds[folds >= 0]):
+                stacked[p, l, folds == fold] = rows[folds == fold].dot(fold_orthos[fold])
+    return stacked, complete
+
+
+def compare_cognates_across_languages(cognates, spaces, languages, periods=("old", "new"), heldout=None):
+    """
+    Computes for all complete cognate sets at once:
+    - the change of every language between the periods (cosine old vs. new), shape (languages, cognate sets)
+    - the cross-language similarity of every language pair in every period, shape (periods, lang, lang, cognate sets)
+    Both are single einsum operations on the stacked vectors instead of separate passes per language.
+    With heldout (see stack_cognate_vectors), the cross-language similarities of the seed pairs are held-out values.
+    """
+    stacked, complete = stack_cognate_vectors(cognates, spaces, languages, periods, heldout=heldout)
+    change = np.einsum("lnd,lnd->ln", stacked[0], stacked[-1])
+    cross_similarity = np.einsum("pand,pbnd->pabn", stacked, stacked)
+    return change, cross_similarity, complete
+
+
+def cross_language_neighbors(words, source_space, target_space, topn=10):
+    """
+    Returns the topn closest words in the target language for each word of the source language (both spaces given as
+    (vectors, rotation into the shared space)). All queries are scored in one matrix product: instead of rotating the
+    whole target vocabulary, the queries are rotated into the original target space.
+    """
+    source_kv, source_rotation = source_space
+    target_kv, target_rotation = target_space
+    words = [word for word in words if word in source_kv.key_to_index]
+    queries = dequantize_rows(source_kv, [source_kv.key_to_index[word] for word in words])
+    queries = queries.dot(source_rotation.dot(target_rotation.T))
+    scores = queries.dot(dequantize_rows(target_kv, slice(None)).T)
+
+    topn = min(topn, scores.shape[1])
+    best = np.argpartition(-scores, topn - 1, axis=1)[:, :topn]
+    neighbors = {}
+    for row, word in enumerate(words):
+        ranked = best[row][np.argsort(-scores[row, best[row]])]
+        neighbors[word] = [(target_kv.index_to_key[index], float(scores[row, index])) for index in ranked]
+    return neighbors
+
+
+def save_cognate_comparison(change, cross_similarity, complete, languages, output_file):
+    """
+    Writes one line per cognate set with the change per language and the cross-language similarities per period.
+    """
+    pairs = [(a, b) for a in range(len(languages)) for b in range(a + 1, len(languages))]
+    header = [f"{lang} word" for lang in languages] + [f"{lang} change" for lang in languages]
+    for period in ("old", "new"):
+        header += [f"{languages[a]}-{languages[b]} {period}" for a, b in pairs]
+
+    with open(output_file, 'w', encoding='utf-8') as file:
+        file.write("\t".join(header) + "\n")
+        for n, cognate in enumerate(complete):
+            row = [cognate[lang] for lang in languages]
+            row += [str(round(float(change[l, n]), 4)) for l in range(len(languages))]
+            for p in (0, -1):
+                row += [str(round(float(cross_similarity[p, a, b, n]), 4)) for a, b in pairs]
+            file.write("\t".join(row) + "\n")
+
+
+if __name__ == '__main__':
+
+    fit_rotations = True
+    compare_cognates = True
+
+    cognate_file = "../word_lists/cognates/3_complete_cognate_list-en-lat-fr-es_manually-curated.txt"
+    languages = ["en", "fr", "es"]
+    reference_lang = "en"
+    model_suffix = "vec300_win10_mc5_ep5"
+
+    cognate_sets = read_cognate_list(cognate_file)
+    # the new models are the reference space of the temporal alignment, the aligned old models live in the same space
+    new_vectors = {lang: get_vectors(f"../models/model_{lang}-new_{model_suffix}.kv") for lang in languages}
+
+    if fit_rotations:
+        for lang in languages:
+            if lang != reference_lang:
+                fit_crosslingual_rotation(new_vectors[lang], new_vectors[reference_lang], cognate_sets, lang,
+                                          reference_lang,
+                                          output=f"../models/crosslingual_{lang}-to-{reference_lang}_{model_suffix}")
+
+    if compare_cognates:
+        rotations = {reference_lang: np.eye(new_vectors[reference_lang].vector_size, dtype=np.float32)}
+        heldout = {}  # the cognates are also the seed pairs, so each set is compared with a rotation that did not see it
+        for lang in languages:
+            if lang != reference_lang:
+                rotation_file = f"../models/crosslingual_{lang}-to-{reference_lang}_{model_suffix}.npz"
+                rotations[lang] = load_alignment(rotation_file)["ortho"]
+                heldout[lang] = heldout_rotations(rotation_file)
+
+        spaces = {}
+        for lang in languages:
+            spaces[(lang, "new")] = (new_vectors[lang], rotations[lang])
+            spaces[(lang, "old")] = (get_vectors(f"../models/aligned_model_{lang}-old_{model_suffix}.npz"),
+                                     rotations[lang])
+
+        change_scores, cross_scores, complete_sets = compare_cognates_across_languages(cognate_sets, spaces, languages,
+                                                                                       heldout=heldout)
+        if not os.path.exists("../results"):  # check if the folder exists, else create it
+            os.makedirs("../results")
+        save_cognate_comparison(change_scores, cross_scores, complete_sets, languages,
+                                "../results/cognate_crosslingual_scores.txt")
+        print(f"Compared {len(complete_sets)} complete cognate sets across {', '.join(languages)}.")
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Seraina Betschart
+# date: 01.12.2024
+# Bachelor Thesis
+# Detecting Semantic Shift with Word Embeddings
+
+import os
+import json
+import time
+import itertools
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from gensim.models import Word2Vec
+from train_models import get_model_path
+from training_callbacks import TrainingMonitor
+from vector_store import export_keyed_vectors
+
+
+# corpus and vocabulary scan of the worker processes, loaded once per process by init_worker()
+_corpus = None
+_vocab_scan = None
+
+RESULT_COLUMNS = ["name", "vector_dim", "context_window", "min_count", "epochs", "vocab_size", "train_seconds",
+                  "training_loss", "model_file"]
+
+
+def scan_vocabulary(corpus_file, name):
+    """
+    Counts all words of a tokenized corpus once and caches the counts under ../models/sweep/.
+    The scan does not depend on any hyperparameter, so all trials of a sweep reuse it and only apply their min_count
+    on top of it (gensim's build_vocab_from_freq) instead of re-scanning the corpus for every combination.
+    The cached scan is only used if it is newer than the corpus file.
+    """
+    cache_file = f"../models/sweep/vocab_scan_{name}.json"
+    if os.path.exists(cache_file) and os.path.getmtime(cache_file) >= os.path.getmtime(corpus_file):
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    with open(corpus_file, 'r', encoding='utf-8') as f:
+        corpus = json.load(f)
+    word_freq = Counter()
+    for sentence in corpus:
+        word_freq.update(sentence)
+    vocab_scan = {"corpus_count": len(corpus), "total_words": sum(word_freq.values()), "word_freq": dict(word_freq)}
+
+    if not os.path.exists("../models/sweep"):  # check if the folder exists, else create it
+        os.makedirs("../models/sweep")
+    with open(cache_file, 'w', encoding='utf-8') as f:
+        json.dump(vocab_scan, f, ensure_ascii=False)
+    return vocab_scan
+
+
+def init_worker(corpus_file, vocab_scan):
+    """
+    Loads the corpus once per worker process, so it is not sent along with every single trial.
+    """
+    global _corpus, _vocab_scan
+    with open(corpus_file, 'r', encoding='utf-8') as f:
+        _corpus = json.load(f)
+    _vocab_scan = vocab_scan
+
+
+def run_trial(name, vector_dim, context_window, min_count, epochs, workers=4):
+    """
+    Trains and saves one model of the sweep. The vocabulary is built from the cached scan instead of the corpus.
+    """
+    start = time.perf_counter()
+    monitor = TrainingMonitor()
+    # skip-gram with a fixed seed like train_models.train_word2vec_model; compute_loss and callbacks have to be
+    # given to train() again, otherwise it falls back to its defaults (no loss, no callbacks)
+    w2v_model = Word2Vec(vector_size=vector_dim, window=context_window, min_count=min_count, epochs=epochs,
+                         workers=workers, sg=1, seed=42, compute_loss=True, callbacks=[monitor])
+    w2v_model.build_vocab_from_freq(_vocab_scan["word_freq"], corpus_count=_vocab_scan["corpus_count"])
+    w2v_model.corpus_total_words = _vocab_scan["total_words"]
+    w2v_model.train(_corpus, total_examples=w2v_model.corpus_count, epochs=w2v_model.epochs, compute_loss=True,
+                    callbacks=[monitor])
+    train_seconds = time.perf_counter() - start
+    if not monitor.epochs:
+        raise Exception(f"No epochs recorded for trial {name}, the training monitor was not called by train().")
+
+    model_file = get_model_path(name, vector_dim, context_window, min_count, epochs)
+    w2v_model.callbacks = ()
+    w2v_model.save(model_file)
+    export_keyed_vectors(w2v_model, f"{model_file}.kv")
+    hyperparameters = {"vector_dim": vector_dim, "context_window": context_window, "min_count": min_count,
+                       "epochs": epochs}
+    monitor.write_report(w2v_model, model_file, hyperparameters, total_seconds=train_seconds)
+
+    return {"name": name, "vector_dim": vector_dim, "context_window": context_window, "min_count": min_count,
+            "epochs": epochs, "vocab_size": len(w2v_model.wv), "train_seconds": round(train_seconds, 2),
+            "training_loss": w2v_model.get_latest_training_loss(), "model_file": model_file}
+
+
+def read_finished_trials(results_file):
+    """
+    Returns the parameter combinations which already have a row in the results table and a saved model.
+    """
+    finished = set()
+    if not os.path.exists(results_file):
+        return finished
+    with open(results_file, 'r', encoding='utf-8') as f:
+        next(f)  # skip header
+        for line in f:
+            row = dict(zip(RESULT_COLUMNS, line.rstrip("\n").split("\t")))
+            if os.path.exists(row["model_file"]):
+                finished.add((int(row["vector_dim"]), int(row["context_window"]), int(row["min_count"]),
+                              int(row["epochs"])))
+    return finished
+
+
+def run_sweep(name, param_grid, n_jobs=2, workers_per_trial=2):
+    """
+    Trains one model for every combination in the parameter grid (dict with the keys vector_dim, context_window,
+    min_count and epochs, each holding a list of values) and appends one row per trial to
+    ../results/sweep_{name}.tsv. Trials which are already in the table are skipped, so an interrupted sweep can simply
+    be started again.
+    Trials run in n_jobs parallel processes, each training with workers_per_trial threads.
+    """
+    corpus_file = f"../corpora/corpus_{name}_tokenized.json"
+    results_file = f"../results/sweep_{name}.tsv"
+
+    if not os.path.exists("../models"):  # check if the folder exists, else create it
+        os.makedirs("../models")
+    if not os.path.exists("../results"):
+        os.makedirs("../results")
+
+    finished = read_finished_trials(results_file)
+    grid = itertools.product(param_grid["vector_dim"], param_grid["context_window"], param_grid["min_count"],
+                             param_grid["epochs"])
+    trials = [params for params in grid if params not in finished]
+    print(f"{len(finished)} trials already finished, {len(trials)} trials left for {name}.")
+    if not trials:
+        return
+
+    vocab_scan = scan_vocabulary(corpus_file, name)
+
+    if not os.path.exists(results_file):
+        with open(results_file, 'w', encoding='utf-8') as f:
+            f.write("\t".join(RESULT_COLUMNS) + "\n")
+
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=init_worker,
+                             initargs=(corpus_file, vocab_scan)) as executor:
+        futures = {executor.submit(run_trial, name, *params, workers=workers_per_trial): params for params in trials}
+        failed = []
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as error:
+                # keep collecting the other trials; the failed one has no row, so it is trained again next time
+                failed.append(futures[future])
+                print(f"Trial {dict(zip(RESULT_COLUMNS[1:5], futures[future]))} failed: {error!r}")
+                continue
+            # write every trial as soon as it is done, so finished trials survive an interrupted sweep
+            with open(results_file, 'a', encoding='utf-8') as f:
+                f.write("\t".join(str(result[column]) for column in RESULT_COLUMNS) + "\n")
+            print(f"Finished trial {result['model_file']} in {result['train_seconds']} s.")
+    if failed:
+        print(f"{len(failed)} of {len(trials)} trials failed (vector_dim, context_window, min_count, epochs): {failed}")
+
+
+if __name__ == '__main__':
+
+    sweep_single_corpus = True
+    sweep_all_eltec = False
+
+    # Adapt the parameter grid
+    grid = {"vector_dim": [100, 300],
+            "context_window": [5, 10],
+            "min_count": [5, 10],
+            "epochs": [5, 10]}
+    parallel_trials = 2
+
+    if sweep_single_corpus:
+        name = "en-old"
+        run_sweep(name, grid, n_jobs=parallel_trials)
+
+    if sweep_all_eltec:
+        lang = ["es", "fr", "en"]
+        time_period = ["old", "new"]
+        for l in lang:
+            for t in time_period:
+                run_sweep(f"{l}-{t}", grid, n_jobs=parallel_trials)
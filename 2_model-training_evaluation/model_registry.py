@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Seraina Betschart
+# date: 01.12.2024
+# Bachelor Thesis
+# Detecting Semantic Shift with Word Embeddings
+
+import os
+from collections import OrderedDict
+import numpy as np
+from vector_store import load_vectors
+
+# loaded vectors of this process: absolute path -> (modification times, vectors, size in bytes),
+# ordered from least to most recently used
+_registry = OrderedDict()
+_memory_budget = 4 * 1024 ** 3  # bytes
+
+
+def set_memory_budget(n_bytes):
+    """
+    Sets how many bytes of vectors the registry keeps loaded before it evicts the least recently used ones.
+    """
+    global _memory_budget
+    _memory_budget = n_bytes
+    _evict()
+
+
+def _vectors_size(kv):
+    """
+    Size of the vector matrix in bytes. For memory-mapped vectors this is an upper bound of what is actually in memory.
+    """
+    return kv.vectors.nbytes
+
+
+def _modification_times(path):
+    """
+    Modification times the loaded vectors depend on: the file itself and, for an alignment file (.npz), also the vector
+    file of the aligned model, whose rows are rotated when the alignment is loaded.
+    """
+    if not path.endswith(".npz"):
+        return (os.path.getmtime(path),)
+    with np.load(path) as data:
+        other_vectors = os.path.join(os.path.dirname(path), str(data["other_vectors"]))
+    return os.path.getmtime(path), os.path.getmtime(other_vectors)
+
+
+def _evict():
+    """
+    Removes the least recently used vectors until the budget is kept (the most recently used vectors always stay).
+    """
+    while len(_registry) > 1 and sum(entry[2] for entry in _registry.values()) > _memory_budget:
+        path, _ = _registry.popitem(last=False)
+        print(f"Model registry: unloaded {path}")
+
+
+def get_vectors(path):
+    """
+    Returns the vectors of a .kv or alignment .npz file (see vector_store.load_vectors). Every file is loaded from disk
+    only once per process; if the file (or the vector file an alignment refers to) was changed on disk since it was
+    loaded, it is loaded again.
+    """
+    key = os.path.abspath(path)
+    mtime = _modification_times(path)
+    if key in _registry and _registry[key][0] == mtime:
+        _registry.move_to_end(key)
+        return _registry[key][1]
+
+    kv = load_vectors(path)
+    _registry[key] = (mtime, kv, _vectors_size(kv))
+    _registry.move_to_end(key)
+    _evict()
+    return kv
+
+
+def clear_registry():
+    """
+    Unloads all vectors.
+    """
+    _registry.clear()
+
+
+def registry_info():
+    """
+    Prints which vectors are loaded (least recently used first) and how much memory they take.
+    """
+    total = 0
+    for path, (mtime, kv, size) in _registry.items():
+        print(f"{path}: {len(kv.index_to_key)} words, {round(size / 1024 ** 2, 1)} MB")
+        total += size
+    print(f"Total: {round(total / 1024 ** 2, 1)} MB of {round(_memory_budget / 1024 ** 2, 1)} MB")
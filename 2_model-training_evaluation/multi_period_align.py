@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Seraina Betschart
+# date: 01.12.2024
+# Bachelor Thesis
+# Detecting Semantic Shift with Word Embeddings
+
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from vector_store import load_vectors, dequantize_rows
+from procrustes_align import procrustes_rotation
+
+
+def anchor_vocabulary(kvs, words=None):
+    """
+    Finds the words which are in the vocabulary of every period (and in words, if set).
+    Returns the anchor words (sorted alphabetically) and, for every period, the row index of each anchor word.
+    """
+    anchors = np.array(kvs[0].index_to_key)
+    for kv in kvs[1:]:
+        anchors = np.intersect1d(anchors, np.array(kv.index_to_key), assume_unique=True)
+    if words:
+        anchors = anchors[np.isin(anchors, np.array(list(words)))]
+
+    anchor_indices = [np.intersect1d(anchors, np.array(kv.index_to_key), assume_unique=True, return_indices=True)[2]
+                      for kv in kvs]
+    return anchors, anchor_indices
+
+
+def chained_rotations(anchor_vecs, reference):
+    """
+    Sequential alignment: every period is aligned to its (already aligned) neighbour on the way to the reference
+    period, e.g. 1850 -> 1860 -> 1870 with 1870 as reference. Returns one rotation matrix per period.
+    """
+    vector_dim = anchor_vecs[0].shape[1]
+    rotations = [None] * len(anchor_vecs)
+    rotations[reference] = np.eye(vector_dim, dtype=anchor_vecs[reference].dtype)
+
+    for i in range(reference - 1, -1, -1):  # earlier periods, going backwards
+        rotations[i] = procrustes_rotation(anchor_vecs[i + 1].dot(rotations[i + 1]), anchor_vecs[i])
+    for i in range(reference + 1, len(anchor_vecs)):  # later periods, going forwards
+        rotations[i] = procrustes_rotation(anchor_vecs[i - 1].dot(rotations[i - 1]), anchor_vecs[i])
+    return rotations, 0
+
+
+def generalized_rotations(anchor_vecs, reference, max_iterations=20, tolerance=1e-6):
+    """
+    Generalized Procrustes alignment: all periods are rotated towards their mean space, the mean is recomputed, and so
+    on until the summed squared distance to the mean stops improving. At the end all rotations are turned such that the
+    reference period keeps its original space. Returns one rotation matrix per period and the number of iterations.
+    """
+    mean_space = anchor_vecs[reference]
+    previous_loss = None
+    iteration = 0
+    for iteration in range(1, max_iterations + 1):
+        rotations = [procrustes_rotation(mean_space, vecs) for vecs in anchor_vecs]
+        rotated = np.stack([vecs.dot(rotation) for vecs, rotation in zip(anchor_vecs, rotations)])
+        mean_space = rotated.mean(axis=0)
+        mean_space /= np.linalg.norm(mean_space, axis=1, keepdims=True)
+        loss = float(((rotated - mean_space) ** 2).sum())
+        if previous_loss is not None and previous_loss - loss <= tolerance * previous_loss:
+            break
+        previous_loss = loss
+
+    # express everything in the space of the reference period (its rotation becomes the identity)
+    back_to_reference = rotations[reference].T
+    return [rotation.dot(back_to_reference) for rotation in rotations], iteration
+
+
+def align_periods(vector_files, output_files, reference=-1, method="chain", words=None):
+    """
+    Aligns the models of N periods of one language into the space of the reference period (default: the last one).
+    method: "chain" (sequential Procrustes between neighbouring periods) or "generalized" (generalized Procrustes).
+    The rotations are computed on the anchor vocabulary (words in all periods) only, but are saved for the whole
+    vocabulary of each period in the alignment file format of procrustes_align.align_and_save (output + ".npz", to be
+    loaded with load_vectors), together with diagnostics per period (output + ".json").
+    """
+    start = time.perf_counter()
+    kvs = [load_vectors(vector_file) for vector_file in vector_files]
+    reference = reference % len(kvs)
+    anchors, anchor_indices = anchor_vocabulary(kvs, words=words)
+    # the exported vectors are already normalized
+    anchor_vecs = [dequantize_rows(kv, indices) for kv, indices in zip(kvs, anchor_indices)]
+
+    if method == "chain":
+        rotations, iterations = chained_rotations(anchor_vecs, reference)
+    elif method == "generalized":
+        rotations, iterations = generalized_rotations(anchor_vecs, reference)
+    else:
+        raise Exception(f"Unknown alignment method '{method}', choose 'chain' or 'generalized'.")
+    seconds = time.perf_counter() - start
+
+    reference_vecs = anchor_vecs[reference]
+    for i, (kv, rotation, output) in enumerate(zip(kvs, rotations, output_files)):
+        anchor_cosines = np.einsum("ij,ij->i", anchor_vecs[i].dot(rotation), reference_vecs)
+        diagnostics = {"method": method,
+                       "reference_vectors": os.path.basename(vector_files[reference]),
+                       "other_vectors": os.path.basename(vector_files[i]),
+                       "anchor_words": len(anchors),
+                       "other_words": len(kv.index_to_key),
+                       "mean_cosine_anchor_words": float(anchor_cosines.mean()),
+                       "iterations": iterations,
+                       "seconds": round(seconds, 3)}
+        np.savez(f"{output}.npz", ortho=rotation, base_indices=anchor_indices[reference],
+                 other_indices=np.arange(len(kv.index_to_key)),
+                 base_vectors=os.path.basename(vector_files[reference]),
+                 other_vectors=os.path.basename(vector_files[i]))
+        with open(f"{output}.json", 'w', encoding='utf-8') as f:
+            json.dump(diagnostics, f, indent=4)
+
+    print(f"Aligned {len(kvs)} periods with {method} Procrustes on {len(anchors)} anchor words "
+          f"in {round(seconds, 2)} s.")
+    return rotations
+
+
+def align_language(lang, periods, method="chain", model_suffix="vec300_win10_mc5_ep5"):
+    """
+    Aligns the models of all periods of one language into the space of the last period.
+    """
+    vector_files = [f"../models/model_{lang}-{period}_{model_suffix}.kv" for period in periods]
+    output_files = [f"../models/{method}_aligned_model_{lang}-{period}_{model_suffix}" for period in periods]
+    align_periods(vector_files, output_files, method=method)
+    return lang
+
+
+def align_all_languages(languages, periods, method="chain", n_jobs=3):
+    """
+    Runs align_language for several languages in parallel processes.
+    """
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        for lang in executor.map(align_language, languages, [periods] * len(languages),
+                                 [method] * len(languages)):
+            print(f"Finished alignment of {lang}.")
+
+
+if __name__ == '__main__':
+
+    # periods in chronological order, the last one is the reference space
+    time_periods = ["old", "new"]
+    languages = ["es", "fr", "en"]
+    alignment_method = "generalized"
+    # alignment_method = "chain"
+
+    align_all_languages(languages, time_periods, method=alignment_method)
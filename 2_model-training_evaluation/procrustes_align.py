@@ -5,8 +5,11 @@
 # Bachelor Thesis
 # Detecting Semantic Shift with Word Embeddings
 
-import gensim
+import os
+import json
+import time
 import numpy as np
+from vector_store import build_keyed_vectors, get_counts, load_vectors, dequantize_rows
 
 
 def smart_procrustes_align_gensim(base_embed, other_embed, words=None):
@@ -19,8 +22,8 @@ def smart_procrustes_align_gensim(base_embed, other_embed, words=None):
 
     First, intersect the vocabularies (see `intersection_align_gensim` documentation).
     Then do the alignment on the other_embed model.
-    Replace the other_embed model's syn0 and syn0norm numpy matrices with the aligned version.
-    Return other_embed.
+    Return new KeyedVectors with the shared vocabulary and the aligned vectors of other_embed.
+    base_embed and other_embed (models or KeyedVectors) are not changed.
     If `words` is set, intersect the two models' vocabulary with the vocabulary in words (see `intersection_align_gensim` documentation).
     """
 
@@ -32,92 +35,118 @@ def smart_procrustes_align_gensim(base_embed, other_embed, words=None):
     in_base_embed, in_other_embed = intersection_align_gensim(base_embed, other_embed, words=words) # if I pass a word list for words parameter, it will only keep vocabulary appearing in the word list
 
     # get the (normalized) embedding matrices
-    base_vecs = in_base_embed.wv.get_normed_vectors()
-    other_vecs = in_other_embed.wv.get_normed_vectors()
+    base_vecs = in_base_embed.get_normed_vectors()
+    other_vecs = in_other_embed.get_normed_vectors()
 
+    ortho = procrustes_rotation(base_vecs, other_vecs)
+    # multiply the embedding matrix by "ortho"
+    aligned_vectors = dequantize_rows(in_other_embed, slice(None)).dot(ortho)
+
+    return build_keyed_vectors(in_other_embed.index_to_key, aligned_vectors, get_counts(in_other_embed))
+
+
+def procrustes_rotation(base_vecs, other_vecs):
+    """
+    Returns the orthogonal matrix which maps the rows of other_vecs as closely as possible onto the rows of base_vecs
+    (same words in the same order in both matrices).
+    """
     # just a matrix dot product with numpy
     m = other_vecs.T.dot(base_vecs)
     # SVD method from numpy
     u, _, v = np.linalg.svd(m)
     # another matrix operation
-    ortho = u.dot(v)
-    # Replace original array with modified one, i.e. multiplying the embedding matrix by "ortho"
-    other_embed.wv.vectors = (other_embed.wv.vectors).dot(ortho)
+    return u.dot(v)
+
 
-    return other_embed
+def shared_vocabulary_indices(kv1, kv2, words=None):
+    """
+    Returns the words which are in both KeyedVectors (and in words, if set), sorted by descending summed counts,
+    together with the row index of each of these words in kv1 and in kv2.
+    """
+    keys1 = np.array(kv1.index_to_key)
+    keys2 = np.array(kv2.index_to_key)
+    common_vocab, indices1, indices2 = np.intersect1d(keys1, keys2, assume_unique=True, return_indices=True)
+    if words:
+        in_words = np.isin(common_vocab, np.array(list(words)))
+        common_vocab, indices1, indices2 = common_vocab[in_words], indices1[in_words], indices2[in_words]
+
+    # sort by frequency (summed for both)
+    order = np.argsort(-(get_counts(kv1)[indices1] + get_counts(kv2)[indices2]), kind="stable")
+    return common_vocab[order].tolist(), indices1[order], indices2[order]
 
 
 def intersection_align_gensim(m1, m2, words=None):
     """
-    Intersect two gensim word2vec models, m1 and m2.
+    Intersect two gensim word2vec models (or their KeyedVectors), m1 and m2.
     Only the shared vocabulary between them is kept.
     If 'words' is set (as list or set), then the vocabulary is intersected with this list as well.
-    Indices are re-organized from 0..N in order of descending frequency (=sum of counts from both m1 and m2).
-    These indices correspond to the new syn0 and syn0norm objects in both gensim models:
-        -- so that Row 0 of m1.syn0 will be for the same word as Row 0 of m2.syn0
-        -- you can find the index of any word on the .index2word list: model.index2word.index(word) => 2
-    The .vocab dictionary is also updated for each model, preserving the count but updating the index.
+    Indices are re-organized from 0..N in order of descending frequency (=sum of counts from both m1 and m2),
+    so that row 0 of the first returned vectors is the same word as row 0 of the second returned vectors.
+    Returns two new KeyedVectors objects (keeping the counts); m1 and m2 themselves are not changed.
+    The intersection, ordering and row selection are done with NumPy on whole arrays instead of word by word.
     """
+    kv1 = m1.wv if hasattr(m1, "wv") else m1
+    kv2 = m2.wv if hasattr(m2, "wv") else m2
+    counts1 = get_counts(kv1)
+    counts2 = get_counts(kv2)
 
-    # Get the vocab for each model
-    vocab_m1 = set(m1.wv.index_to_key)
-    vocab_m2 = set(m2.wv.index_to_key)
-
-    # Find the common vocabulary
-    common_vocab = vocab_m1 & vocab_m2
-    if words: common_vocab &= set(words)
-
-    # If no alignment necessary because vocab is identical...
-    if not vocab_m1 - common_vocab and not vocab_m2 - common_vocab:
-        return (m1, m2)
-
-    # Otherwise sort by frequency (summed for both)
-    common_vocab = list(common_vocab)
-    common_vocab.sort(key=lambda w: m1.wv.get_vecattr(w, "count") + m2.wv.get_vecattr(w, "count"), reverse=True)
-    # print(len(common_vocab))
+    # If no alignment necessary because vocab is identical, return views of the original matrices (float32 copies if
+    # they are stored quantized)
+    if not words and kv1.index_to_key == kv2.index_to_key:
+        return (build_keyed_vectors(kv1.index_to_key, dequantize_rows(kv1, slice(None)), counts1),
+                build_keyed_vectors(kv2.index_to_key, dequantize_rows(kv2, slice(None)), counts2))
 
-    # Then for each model...
-    for m in [m1, m2]:
-        # Replace old syn0norm array with new one (with common vocab)
-        indices = [m.wv.key_to_index[w] for w in common_vocab]
-        old_arr = m.wv.vectors
-        new_arr = np.array([old_arr[index] for index in indices])
-        m.wv.vectors = new_arr
+    # Otherwise find the common vocabulary (sorted by summed frequency) and the row of each common word in both models
+    common_vocab, indices1, indices2 = shared_vocabulary_indices(kv1, kv2, words=words)
 
-        # Replace old vocab dictionary with new one (with common vocab)
-        # and old index2word with new one
-        new_key_to_index = {}
-        new_index_to_key = []
-        for new_index, key in enumerate(common_vocab):
-            new_key_to_index[key] = new_index
-            new_index_to_key.append(key)
-        m.wv.key_to_index = new_key_to_index
-        m.wv.index_to_key = new_index_to_key
+    # Select the rows of the common vocab from both matrices (new arrays, the originals stay untouched)
+    aligned1 = build_keyed_vectors(common_vocab, dequantize_rows(kv1, indices1), counts1[indices1])
+    aligned2 = build_keyed_vectors(common_vocab, dequantize_rows(kv2, indices2), counts2[indices2])
 
-        print(len(m.wv.key_to_index), len(m.wv.vectors))
-
-    return (m1, m2)
+    return (aligned1, aligned2)
 
 
 ####################################################################
 # my code starts here:
 ####################################################################
-def align_and_save(base_model, other_model, output):
+def align_and_save(base_vectors, other_vectors, output):
     """
-    Input: Two models whose vector spaces should be aligned.
-    Output: New model 2, which is aligned to model 1.
+    Input: The exported vectors (.kv) of two models whose vector spaces should be aligned.
+    Output: Instead of a full aligned copy of model 2, only the rotation matrix ("ortho") and the rows of the shared
+    vocabulary in both models are saved (output + ".npz"), plus some diagnostics of the alignment (output + ".json").
+    load_vectors(output + ".npz") then applies the rotation to the memory-mapped vectors of model 2.
     """
-    embedding_model_base = gensim.models.Word2Vec.load(base_model)
-    embedding_model_other = gensim.models.Word2Vec.load(other_model)
-    aligned_model_other = smart_procrustes_align_gensim(embedding_model_base, embedding_model_other)
-    aligned_model_other.save(output)
-
-    # test alignment
-    # vector_table1 = embedding_model_base.wv['terrible']
-    # vector_table2 = aligned_model_other.wv['terrible']
-    # cosine_similarity = np.dot(vector_table1, vector_table2) / (np.linalg.norm(vector_table1) *
-    #                                                             np.linalg.norm(vector_table2))
-    # print(f"Cosine Similarity between 'terrible' embeddings: {cosine_similarity}")
+    start = time.perf_counter()
+    base_kv = load_vectors(base_vectors)
+    other_kv = load_vectors(other_vectors)
+    shared_vocab, base_indices, other_indices = shared_vocabulary_indices(base_kv, other_kv)
+
+    # the exported vectors are already normalized
+    base_vecs = dequantize_rows(base_kv, base_indices)
+    other_vecs = dequantize_rows(other_kv, other_indices)
+    ortho = procrustes_rotation(base_vecs, other_vecs)
+    seconds = time.perf_counter() - start
+
+    # diagnostics: how close the rotated words of model 2 are to the same words in model 1
+    rotated = other_vecs.dot(ortho)
+    anchor_cosines = np.einsum("ij,ij->i", rotated, base_vecs)
+    diagnostics = {"base_vectors": os.path.basename(base_vectors),
+                   "other_vectors": os.path.basename(other_vectors),
+                   "shared_words": len(shared_vocab),
+                   "base_words": len(base_kv.index_to_key),
+                   "other_words": len(other_kv.index_to_key),
+                   "mean_cosine_shared_words": float(anchor_cosines.mean()),
+                   "residual": float(np.linalg.norm(rotated - base_vecs) / np.sqrt(len(shared_vocab))),
+                   "seconds": round(seconds, 3)}
+
+    # the vector files are stored by name only, they are looked up in the folder of the alignment file
+    np.savez(f"{output}.npz", ortho=ortho, base_indices=base_indices, other_indices=other_indices,
+             base_vectors=os.path.basename(base_vectors), other_vectors=os.path.basename(other_vectors))
+    with open(f"{output}.json", 'w', encoding='utf-8') as f:
+        json.dump(diagnostics, f, indent=4)
+    print(f"Aligned {other_vectors} to {base_vectors}: {len(shared_vocab)} shared words, "
+          f"mean cosine {round(diagnostics['mean_cosine_shared_words'], 3)}")
+    return diagnostics
 
 
 if __name__ == '__main__':
@@ -125,24 +154,30 @@ if __name__ == '__main__':
     # choose settings
     align_two_models = False
     align_all_eltec = True
+    benchmark = False
 
     if align_two_models:
-        # set the two Word2Vec models to align
-        base_embed = "../models/model_en-new_vec300_win10_mc5_ep5"
-        other_embed = "../models/model_en-old_vec300_win10_mc5_ep5"
+        # set the exported vectors of the two Word2Vec models to align
+        base_embed = "../models/model_en-new_vec300_win10_mc5_ep5.kv"
+        other_embed = "../models/model_en-old_vec300_win10_mc5_ep5.kv"
 
-        output_model = f"../models/aligned_{other_embed.split('/')[-1]}"
+        output_model = f"../models/aligned_{other_embed.split('/')[-1][:-3]}"
         align_and_save(base_embed, other_embed, output_model)
 
     if align_all_eltec: # check if model names are correct
         lang = ["fr", "es", "en"]
         for l in lang:
-            base_embed = f"../models/model_{l}-new_vec300_win10_mc5_ep5"
-            other_embed = f"../models/model_{l}-old_vec300_win10_mc5_ep5"
+            base_embed = f"../models/model_{l}-new_vec300_win10_mc5_ep5.kv"
+            other_embed = f"../models/model_{l}-old_vec300_win10_mc5_ep5.kv"
 
-            output_model = f"../models/aligned_{other_embed.split('/')[-1]}"
+            output_model = f"../models/aligned_{other_embed.split('/')[-1][:-3]}"
             align_and_save(base_embed, other_embed, output_model)
 
+    if benchmark:
+        # the benchmark lives in benchmark_alignment.py, which itself imports this module
+        from benchmark_alignment import benchmark_intersection
+        benchmark_intersection()
+
 
 
 
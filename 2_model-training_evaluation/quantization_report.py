@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Seraina Betschart
+# date: 01.12.2024
+# Bachelor Thesis
+# Detecting Semantic Shift with Word Embeddings
+
+import os
+import json
+import numpy as np
+from scipy.stats import spearmanr
+from vector_store import export_keyed_vectors, load_vectors, load_alignment
+from cosine_engine import rowwise_cosine, get_rows, blocked_top_k_neighbors, neighbor_overlap
+
+
+def quantized_path(vectors_file, dtype):
+    """
+    Returns the path of the quantized copy of an exported vector file (e.g. model.kv -> model.int8.kv).
+    """
+    return f"{vectors_file[:-3]}.{dtype}.kv"
+
+
+def change_scores(new_kv, old_kv, alignment):
+    """
+    Cosine similarity of all shared words between the new and the rotated old vectors, using the rows and rotation of a
+    saved alignment. The quantized rows are not exactly unit length, so the cosine is normalized here.
+    """
+    rotated = get_rows(old_kv, alignment["other_indices"]).dot(alignment["ortho"])
+    return rowwise_cosine(get_rows(new_kv, alignment["base_indices"]), rotated, normalized=False)
+
+
+def compare_quantization(lang, dtypes=("float16", "int8"), model_suffix="vec300_win10_mc5_ep5", k=10,
+                         n_queries=1000, seed=42, output_dir="../results/benchmarks"):
+    """
+    Exports quantized copies of the old and new vectors of a language and compares them with float32:
+    - memory of the vector matrix per model
+    - Spearman rank correlation and largest difference of the change scores (old vs. new cosine) of all shared words
+    - overlap of the k nearest neighbors of a random sample of words in the new model
+    The report is printed and saved as json.
+    """
+    new_file = f"../models/model_{lang}-new_{model_suffix}.kv"
+    old_file = f"../models/model_{lang}-old_{model_suffix}.kv"
+    alignment = load_alignment(f"../models/aligned_model_{lang}-old_{model_suffix}.npz")
+
+    new_kv, old_kv = load_vectors(new_file), load_vectors(old_file)
+    reference_scores = change_scores(new_kv, old_kv, alignment)
+    rng = np.random.default_rng(seed)
+    queries = rng.choice(len(new_kv.index_to_key), size=min(n_queries, len(new_kv.index_to_key)), replace=False)
+    reference_neighbors = blocked_top_k_neighbors(get_rows(new_kv, queries), new_kv, k, query_indices=queries)
+    report = {"lang": lang, "float32": {"mb_per_model": round(new_kv.vectors.nbytes / 1024 ** 2, 1)}}
+
+    for dtype in dtypes:
+        for vectors_file, kv in ((new_file, new_kv), (old_file, old_kv)):
+            export_keyed_vectors(kv, quantized_path(vectors_file, dtype), dtype=dtype)
+        new_q, old_q = load_vectors(quantized_path(new_file, dtype)), load_vectors(quantized_path(old_file, dtype))
+
+        scores = change_scores(new_q, old_q, alignment)
+        neighbors = blocked_top_k_neighbors(get_rows(new_q, queries), new_q, k, query_indices=queries)
+        report[dtype] = {"mb_per_model": round(new_q.vectors.nbytes / 1024 ** 2, 1),
+                         "change_score_spearman": float(spearmanr(reference_scores, scores)[0]),
+                         "change_score_max_difference": float(np.abs(reference_scores - scores).max()),
+                         f"neighbor_overlap_at_{k}": float(neighbor_overlap(reference_neighbors, neighbors).mean())}
+        print(f"{lang} {dtype}: {report[dtype]}")
+
+    if not os.path.exists(output_dir):  # check if the folder exists, else create it
+        os.makedirs(output_dir)
+    with open(os.path.join(output_dir, f"quantization_{lang}_{model_suffix}.json"), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=4)
+    return report
+
+
+if __name__ == '__main__':
+
+    for lang in ["en", "fr", "es"]:
+        compare_quantization(lang)
@@ -9,21 +9,39 @@ import os
 from gensim.models import Word2Vec
 from collections import Counter
 import json
+from time import perf_counter
+import numpy as np
+import matplotlib.pyplot as plt
+from training_callbacks import TrainingMonitor
+from vector_store import export_keyed_vectors, load_vectors, dequantize_rows
+from procrustes_align import smart_procrustes_align_gensim
+
+
+def get_model_path(name, vector_dim, context_window, min_occurrences, epoch_num, prefix="model"):
+    """
+    Returns the file path under which a model trained with the given hyperparameters is saved.
+    """
+    return f"../models/{prefix}_{name}_vec{vector_dim}_win{context_window}_mc{min_occurrences}_ep{epoch_num}"
 
 
 def train_word2vec_model(preprocessed_corpus, vector_dim=200, context_window=5, min_occurrences=5, epoch_num=5,
-                         save_model="no"):
+                         save_model="no", compute_loss=False):
     """
     Trains a word2vec model with my chosen parameters on the provided corpus and saves it for further use.
+    If the model is saved, a run report with timing, throughput, memory (and loss if compute_loss) is saved next to it,
+    as well as the normalized vectors only (model name + ".kv") which the analysis scripts load.
     """
     print("start training")
+    start = perf_counter()
+    monitor = TrainingMonitor()
     # vector size: 300 is used in most papers, window size: 5 is very common, sg=1 for skip-gram
     # min_count: minimum number of appearances a word should have to be included in vocab
     # epochs: default epochs 5 is used in most papers on the topic
     # workers: speeds up training, depends on no. of cpu cores available, doesn't matter much for me as corpora small
     # random seed: use the same random seed (negative sampling) to have more consistent, more comparable embeddings
     w2v_model = Word2Vec(sentences=preprocessed_corpus, vector_size=vector_dim, window=context_window,
-                         min_count=min_occurrences, epochs=epoch_num, workers=4, sg=1, seed=42)
+                         min_count=min_occurrences, epochs=epoch_num, workers=4, sg=1, seed=42,
+                         compute_loss=compute_loss, callbacks=[monitor])
 
     ################################################################################################################
     # for information: gensim's word2vec default settings:
@@ -39,34 +57,226 @@ def train_word2vec_model(preprocessed_corpus, vector_dim=200, context_window=5,
 
     if save_model != "no": # save model if chosen
         # save_model_name = f"../models/model_{save_model}_vec{vector_dim}_win{context_window}_mc{min_occurrences}"
-        save_model_name = f"../models/model_{save_model}_vec{vector_dim}_win{context_window}_mc{min_occurrences}_ep{epoch_num}"
+        save_model_name = get_model_path(save_model, vector_dim, context_window, min_occurrences, epoch_num)
+        if not os.path.exists("../models"):  # check if the folder exists, else create it
+            os.makedirs("../models")
+        w2v_model.callbacks = ()  # the monitor is only needed during training, don't pickle it with the model
+        w2v_model.save(save_model_name)
+        export_keyed_vectors(w2v_model, f"{save_model_name}.kv")
+        hyperparameters = {"vector_dim": vector_dim, "context_window": context_window,
+                           "min_count": min_occurrences, "epochs": epoch_num}
+        monitor.write_report(w2v_model, save_model_name, hyperparameters, total_seconds=perf_counter() - start)
+
+    return w2v_model
+
+
+def train_warm_start(old_model_file, new_corpus, epoch_num=3, save_model="no", report_baseline=False,
+                     baseline_epochs=5):
+    """
+    Trains the model of a later period starting from the vectors of the earlier period's model instead of a random
+    initialization: the old model is loaded, its vocabulary is updated with the new corpus and training continues on
+    the new corpus only. The resulting model already lives in the space of the old model, so no Procrustes alignment
+    is needed afterwards.
+    Words which are kept from the old vocabulary but don't reach min_count in the new corpus would keep their old
+    vectors, so they are left out of the exported vectors. The word counts of the saved model are the counts in the
+    new corpus.
+    If report_baseline is chosen, a model is also trained from scratch on the new corpus and aligned to the old model
+    to report the time saved by the warm start.
+    """
+    print("start warm-start training")
+    start = perf_counter()
+    monitor = TrainingMonitor()
+
+    new_counts = Counter()
+    for sentence in new_corpus:
+        new_counts.update(sentence)
+
+    w2v_model = Word2Vec.load(old_model_file)
+    w2v_model.build_vocab(new_corpus, update=True)
+    w2v_model.train(new_corpus, total_examples=w2v_model.corpus_count, epochs=epoch_num, callbacks=[monitor])
+    w2v_model.wv.expandos["count"] = np.array([new_counts[word] for word in w2v_model.wv.index_to_key],
+                                              dtype=np.int64)
+    warm_seconds = perf_counter() - start
+    print("end warm-start training")
+
+    timing = {"warm_start_from": old_model_file, "warm_start_seconds": round(warm_seconds, 3)}
+    if report_baseline:
+        start = perf_counter()
+        cold_model = train_word2vec_model(new_corpus, vector_dim=w2v_model.vector_size, context_window=w2v_model.window,
+                                          min_occurrences=w2v_model.min_count, epoch_num=baseline_epochs)
+        smart_procrustes_align_gensim(Word2Vec.load(old_model_file), cold_model)
+        baseline_seconds = perf_counter() - start
+        timing["train_and_align_seconds"] = round(baseline_seconds, 3)
+        timing["seconds_saved"] = round(baseline_seconds - warm_seconds, 3)
+        print(f"Warm start: {round(warm_seconds, 1)} s, training from scratch + alignment: "
+              f"{round(baseline_seconds, 1)} s, saved {round(baseline_seconds - warm_seconds, 1)} s.")
+
+    if save_model != "no":  # save model if chosen
+        save_model_name = get_model_path(save_model, w2v_model.vector_size, w2v_model.window, w2v_model.min_count,
+                                         epoch_num, prefix="warm_model")
         if not os.path.exists("../models"):  # check if the folder exists, else create it
             os.makedirs("../models")
         w2v_model.save(save_model_name)
+        new_words = [word for word in w2v_model.wv.index_to_key if new_counts[word] >= w2v_model.min_count]
+        export_keyed_vectors(w2v_model, f"{save_model_name}.kv", words=new_words)
+        hyperparameters = {"vector_dim": w2v_model.vector_size, "context_window": w2v_model.window,
+                           "min_count": w2v_model.min_count, "epochs": epoch_num}
+        monitor.write_report(w2v_model, save_model_name, hyperparameters, total_seconds=warm_seconds, extra=timing)
 
     return w2v_model
 
 
-def analyse_vocab_size(tokenized_corpus):
+class TemporalReferencingCorpus:
+    """
+    Merged corpus of several periods for temporal referencing: only the target words are tagged with their period
+    (e.g. voice_noun@old and voice_noun@new), all other words stay shared between the periods.
+    The sentences of all periods are iterated in one fixed shuffled order, so no period is trained only at the end
+    with the lowest learning rate. Can be iterated several times, as gensim needs it (vocabulary scan + epochs).
+    """
+
+    def __init__(self, corpora, target_words, seed=42):
+        # corpora: dictionary with the period names as keys and the tokenized corpora as values
+        self.corpora = corpora
+        self.periods = list(corpora)
+        self.target_words = set(target_words)
+        period_ids = np.concatenate([np.full(len(corpora[period]), i, dtype=np.int32)
+                                     for i, period in enumerate(self.periods)])
+        sentence_ids = np.concatenate([np.arange(len(corpora[period]), dtype=np.int64) for period in self.periods])
+        order = np.random.default_rng(seed).permutation(len(period_ids))
+        self.period_ids = period_ids[order]
+        self.sentence_ids = sentence_ids[order]
+
+    def __iter__(self):
+        for period_id, sentence_id in zip(self.period_ids, self.sentence_ids):
+            period = self.periods[period_id]
+            sentence = self.corpora[period][sentence_id]
+            yield [f"{word}@{period}" if word in self.target_words else word for word in sentence]
+
+
+def train_temporal_referencing(old_corpus, new_corpus, target_words, vector_dim=200, context_window=5,
+                               min_occurrences=5, epoch_num=5, save_model="no"):
+    """
+    Alternative to training one model per period and aligning them: trains a single model on the merged corpus of
+    both periods in which only the target words are tagged with their period (see TemporalReferencingCorpus).
+    The change of a target word can then be read directly from this one space (see temporal_change_scores), without
+    alignment and without losing words in a vocabulary intersection.
+    """
+    corpus = TemporalReferencingCorpus({"old": old_corpus, "new": new_corpus}, target_words)
+    return train_word2vec_model(preprocessed_corpus=corpus, vector_dim=vector_dim, context_window=context_window,
+                                min_occurrences=min_occurrences, epoch_num=epoch_num, save_model=save_model)
+
+
+def temporal_change_scores(kv, target_words):
+    """
+    Input: vectors of a temporal referencing model (exported .kv, so already normalized) and the target words.
+    Returns the cosine similarities between word@old and word@new as list of [score, word], sorted with the most
+    changed words first, and the target words which are missing in one of the periods (below min_count).
+    """
+    scored_words = [word for word in target_words if f"{word}@old" in kv and f"{word}@new" in kv]
+    scored_set = set(scored_words)
+    missing_words = [word for word in target_words if word not in scored_set]
+    old_indices = [kv.key_to_index[f"{word}@old"] for word in scored_words]
+    new_indices = [kv.key_to_index[f"{word}@new"] for word in scored_words]
+    # row-wise dot products of the normalized vectors are the cosine similarities
+    scores = np.einsum("ij,ij->i", dequantize_rows(kv, old_indices), dequantize_rows(kv, new_indices))
+
+    cosine_list = sorted([[float(score), word] for score, word in zip(scores, scored_words)])
+    return cosine_list, missing_words
+
+
+def vocab_frequency_histogram(tokenized_corpus):
+    """
+    Streams the corpus once and builds a count-of-counts histogram: for every word frequency f, how many words occur
+    exactly f times. Returns the frequencies in ascending order together with the vocabulary size and the number of
+    tokens covered when only words with frequency >= f are kept (cumulative sums from the rarest words upwards).
+    """
+    word_freq = Counter()
+    for sentence in tokenized_corpus:
+        word_freq.update(sentence)
+
+    count_of_counts = Counter(word_freq.values())
+    frequencies = np.array(sorted(count_of_counts), dtype=np.int64)
+    words_per_freq = np.array([count_of_counts[freq] for freq in frequencies], dtype=np.int64)
+
+    # reverse cumulative sums: entry i counts all words with frequency >= frequencies[i]
+    vocab_sizes = np.cumsum(words_per_freq[::-1])[::-1]
+    token_coverage = np.cumsum((words_per_freq * frequencies)[::-1])[::-1]
+    return frequencies, vocab_sizes, token_coverage
+
+
+def vocab_size_at(histogram, min_count):
+    """
+    Looks up the vocabulary size and the token coverage (as share of all tokens) for a min_count in the histogram
+    returned by vocab_frequency_histogram.
+    """
+    frequencies, vocab_sizes, token_coverage = histogram
+    index = np.searchsorted(frequencies, min_count, side="left")
+    if index == len(frequencies):
+        return 0, 0.0
+    return int(vocab_sizes[index]), float(token_coverage[index] / token_coverage[0])
+
+
+def analyse_vocab_size(tokenized_corpus, thresholds=(1, 2, 3, 4, 5, 10, 20)):
     """
     Analyse my corpus and check how big my vocabulary would be with different minimum counts per word in vocab.
     """
-    # Calculate word frequencies
-    word_freq = Counter([word for sentence in tokenized_corpus for word in sentence])
+    histogram = vocab_frequency_histogram(tokenized_corpus)
 
     # Check how many words would be excluded based on different min_count thresholds
-    for min_count in [1, 2, 3, 4, 5, 10, 20]:
-        vocab_size = sum(1 for word, freq in word_freq.items() if freq >= min_count)
-        print(f"Words with frequency >= {min_count}: {vocab_size}")
+    for min_count in thresholds:
+        vocab_size, coverage = vocab_size_at(histogram, min_count)
+        print(f"Words with frequency >= {min_count}: {vocab_size} (covering {round(coverage * 100, 2)}% of tokens)")
+    return histogram
+
+
+def plot_vocab_curves(histograms, output_name="vocab_curves", max_count=100):
+    """
+    Plots vocabulary size and token coverage against min_count for several corpora in one figure.
+    Input: dictionary with corpus names as keys and histograms (see vocab_frequency_histogram) as values.
+    """
+    min_counts = np.arange(1, max_count + 1)
+    fig, (ax_vocab, ax_coverage) = plt.subplots(1, 2, figsize=(12, 5))
+
+    for name, (frequencies, vocab_sizes, token_coverage) in histograms.items():
+        # same lookup as vocab_size_at, but for all min_counts at once
+        indices = np.searchsorted(frequencies, min_counts, side="left")
+        padded_vocab = np.append(vocab_sizes, 0)
+        padded_coverage = np.append(token_coverage, 0) / token_coverage[0]
+        ax_vocab.plot(min_counts, padded_vocab[indices], label=name)
+        ax_coverage.plot(min_counts, padded_coverage[indices] * 100, label=name)
+
+    ax_vocab.set_xlabel('min_count', fontsize=12)
+    ax_vocab.set_ylabel('Vocabulary size', fontsize=12)
+    ax_vocab.set_yscale('log')
+    ax_coverage.set_xlabel('min_count', fontsize=12)
+    ax_coverage.set_ylabel('Token coverage (%)', fontsize=12)
+    for ax in (ax_vocab, ax_coverage):
+        ax.grid(linestyle='--', alpha=0.7)
+        ax.legend(fontsize=10)
+
+    plt.tight_layout()
+    # Save the plot to a png image
+    if not os.path.exists("../plots/vocabulary"):  # check if the folder exists, else create it
+        os.makedirs("../plots/vocabulary")
+    plt.savefig(f"../plots/vocabulary/{output_name}.png", format="png", dpi=300)
+    # close figure to release memory
+    plt.close()
 
 ######################################################################################################################
 if __name__ == '__main__':
 
     # Analyse the size of the vocabulary of a corpus with different minimum occurrence counts per lemma
     analyse_vocabulary = False
+    # Plot vocabulary size and token coverage against min_count for all ELTeC corpora
+    plot_vocabulary_all_eltec = False
     # Train embedding model
     train = False
     train_all_eltec = True
+    # Train the new models starting from the old models (no alignment needed afterwards)
+    train_warm_start_all_eltec = False
+    warm_start_epochs = 3
+    # Train one model per language on both periods, with period-tagged target words (no alignment needed afterwards)
+    train_temporal_referencing_all_eltec = False
 
     # Choose data
     name = "en-old"
@@ -85,6 +295,14 @@ if __name__ == '__main__':
     if analyse_vocabulary:
         analyse_vocab_size(data)
 
+    if plot_vocabulary_all_eltec:
+        vocab_histograms = {}
+        for l in ["es", "fr", "en"]:
+            for t in ["old", "new"]:
+                with open(f"../corpora/corpus_{l}-{t}_tokenized.json", 'r', encoding='utf-8') as f:
+                    vocab_histograms[f"{l}-{t}"] = vocab_frequency_histogram(json.load(f))
+        plot_vocab_curves(vocab_histograms)
+
     if train:
         embedding_model = train_word2vec_model(preprocessed_corpus=data, vector_dim=vector_dimension,
                                                context_window=window, min_occurrences=min_count, epoch_num=epochs,
@@ -105,3 +323,34 @@ if __name__ == '__main__':
                                                        epoch_num=epochs,
                                                        save_model=name)
 
+    if train_warm_start_all_eltec:
+        for l in ["es", "fr", "en"]:
+            old_model = get_model_path(f"{l}-old", vector_dimension, window, min_count, epochs)
+            with open(f"../corpora/corpus_{l}-new_tokenized.json", 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            embedding_model = train_warm_start(old_model, data, epoch_num=warm_start_epochs, save_model=f"{l}-new",
+                                               report_baseline=True, baseline_epochs=epochs)
+
+    if train_temporal_referencing_all_eltec:
+        for l in ["es", "fr", "en"]:
+            with open(f"../corpora/corpus_{l}-old_tokenized.json", 'r', encoding='utf-8') as f:
+                data_old = json.load(f)
+            with open(f"../corpora/corpus_{l}-new_tokenized.json", 'r', encoding='utf-8') as f:
+                data_new = json.load(f)
+            with open(f"../word_lists/most_frequent_words/top1000_words_{l}_with-pos2.txt", 'r',
+                      encoding='utf-8') as f:
+                targets = [line.split("\t")[0].replace("\n", "") for line in f]
+
+            train_temporal_referencing(data_old, data_new, targets, vector_dim=vector_dimension,
+                                       context_window=window, min_occurrences=min_count, epoch_num=epochs,
+                                       save_model=f"{l}-tr")
+            tr_model = get_model_path(f"{l}-tr", vector_dimension, window, min_count, epochs)
+            tr_vectors = load_vectors(f"{tr_model}.kv")
+            cosine_scores, missing = temporal_change_scores(tr_vectors, targets)
+            print(f"{l}: {len(cosine_scores)} target words scored, {len(missing)} below min_count in one period.")
+            if not os.path.exists("../results"):  # check if the folder exists, else create it
+                os.makedirs("../results")
+            with open(f"../results/temporal_referencing_{l}_cosine_scores.txt", 'w', encoding='utf-8') as file:
+                for ele in cosine_scores:
+                    file.write(f"{ele[1]}\t{ele[0]}")
+                    file.write("\n")
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Seraina Betschart
+# date: 01.12.2024
+# Bachelor Thesis
+# Detecting Semantic Shift with Word Embeddings
+
+import os
+import sys
+import json
+import time
+import platform
+from gensim.models.callbacks import CallbackAny2Vec
+
+try:
+    import resource  # not available on Windows, peak memory is then not reported
+except ImportError:
+    resource = None
+
+
+def peak_rss_mb():
+    """
+    Returns the peak resident memory of the current process in MB (or None if it cannot be measured).
+    This is the peak over the whole lifetime of the process, so it also contains everything the process did before.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is given in bytes on macOS and in kilobytes on Linux
+    if sys.platform == "darwin":
+        return round(peak / 1024 ** 2, 1)
+    return round(peak / 1024, 1)
+
+
+def current_rss_mb():
+    """
+    Returns the resident memory the current process uses right now in MB (only on Linux, else None).
+    """
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return round(resident_pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2, 1)
+
+
+def machine_info():
+    """
+    Returns some information about the machine, so runs on different machines can be compared.
+    """
+    return {"platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version()}
+
+
+class TrainingMonitor(CallbackAny2Vec):
+    """
+    Gensim callback which records elapsed time, words per second, training loss (only if the model was created with
+    compute_loss=True), vocabulary size and memory for every epoch.
+    The memory of one run is measured against the memory the process used when training started, as several models
+    are trained one after another in the same process (train_all_eltec, the sweep workers): the resident memory is
+    sampled after every batch, and the process peak counts only if this run raised it.
+    """
+
+    def __init__(self):
+        self.epochs = []
+        self.start_time = None
+        self.epoch_start = None
+        self.train_seconds = None
+        self.previous_loss = 0.0
+        self.rss_before = None
+        self.peak_before = None
+        self.max_rss = None
+        self.peak_rss = None
+
+    def on_train_begin(self, model):
+        self.start_time = time.perf_counter()
+        self.rss_before = current_rss_mb()
+        self.peak_before = peak_rss_mb()
+        self.max_rss = self.rss_before
+
+    def on_batch_end(self, model):
+        rss = current_rss_mb()
+        if rss is not None and (self.max_rss is None or rss > self.max_rss):
+            self.max_rss = rss
+
+    def on_epoch_begin(self, model):
+        self.epoch_start = time.perf_counter()
+
+    def on_epoch_end(self, model):
+        seconds = time.perf_counter() - self.epoch_start
+        # corpus_total_words is the number of raw words gensim goes through per epoch
+        total_words = model.corpus_total_words or 0
+        epoch_info = {"epoch": len(self.epochs) + 1,
+                      "seconds": round(seconds, 3),
+                      "words_per_second": round(total_words / seconds) if seconds > 0 else None,
+                      "vocab_size": len(model.wv),
+                      "rss_mb": current_rss_mb()}
+        if model.compute_loss:
+            # gensim accumulates the loss over all epochs of one train() call
+            cumulative_loss = model.get_latest_training_loss()
+            epoch_info["training_loss"] = cumulative_loss - self.previous_loss
+            self.previous_loss = cumulative_loss
+        self.epochs.append(epoch_info)
+        print(f"Epoch {epoch_info['epoch']} done in {epoch_info['seconds']} s "
+              f"({epoch_info['words_per_second']} words/s).")
+
+    def on_train_end(self, model):
+        self.train_seconds = time.perf_counter() - self.start_time
+        self.peak_rss = self.run_peak_rss_mb()
+
+    def run_peak_rss_mb(self):
+        """
+        Returns the peak resident memory during this training run in MB (or None if it cannot be measured).
+        """
+        peak_after = peak_rss_mb()
+        if peak_after is not None and self.peak_before is not None and peak_after > self.peak_before:
+            return peak_after  # this run set a new peak for the process, so the process peak is the peak of the run
+        return self.max_rss
+
+    def write_report(self, model, model_file, hyperparameters, total_seconds=None, extra=None):
+        """
+        Saves a structured run report as JSON next to the saved model (model_file + "_report.json").
+        Entries in the dictionary extra are added to the report as they are.
+        """
+        report = {"model_file": model_file,
+                  "hyperparameters": hyperparameters,
+                  "vocab_size": len(model.wv),
+                  "corpus_sentences": model.corpus_count,
+                  "corpus_words": model.corpus_total_words,
+                  "train_seconds": round(self.train_seconds, 3) if self.train_seconds is not None else None,
+                  "total_seconds": round(total_seconds, 3) if total_seconds is not None else None,
+                  "rss_before_training_mb": self.rss_before,
+                  "peak_rss_mb": self.peak_rss,
+                  "peak_rss_increase_mb": round(self.peak_rss - self.rss_before, 1)
+                  if self.peak_rss is not None and self.rss_before is not None else None,
+                  "epochs": self.epochs,
+                  "machine": machine_info(),
+                  "date": time.strftime("%Y-%m-%d %H:%M:%S")}
+        if extra:
+            report.update(extra)
+
+        with open(f"{model_file}_report.json", 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4)
+        return report
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Seraina Betschart
+# date: 01.12.2024
+# Bachelor Thesis
+# Detecting Semantic Shift with Word Embeddings
+
+import os
+import time
+import numpy as np
+from gensim.models import Word2Vec, KeyedVectors
+
+
+def build_keyed_vectors(keys, vectors, counts=None, scale=None):
+    """
+    Creates a KeyedVectors object from a list of words and their vector matrix (same order) without copying the
+    matrix. Optionally also stores the word counts (as gensim does when training) and, for int8 vectors, the scale of
+    each row (see quantize_vectors).
+    """
+    kv = KeyedVectors(vector_size=vectors.shape[1], dtype=vectors.dtype)
+    kv.index_to_key = list(keys)
+    kv.key_to_index = {key: index for index, key in enumerate(kv.index_to_key)}
+    kv.vectors = vectors
+    if counts is not None:
+        kv.expandos["count"] = np.asarray(counts, dtype=np.int64)
+    if scale is not None:
+        kv.expandos["scale"] = scale
+    return kv
+
+
+def get_counts(kv):
+    """
+    Returns the word counts stored in a KeyedVectors object as array (zeros if the vectors have no counts).
+    """
+    if "count" in kv.expandos:
+        return kv.expandos["count"]
+    return np.zeros(len(kv.index_to_key), dtype=np.int64)
+
+
+def quantize_vectors(vectors, dtype="float32"):
+    """
+    Converts normalized vectors to a smaller type: "float16" (half the memory of float32) or "int8" (a quarter; every
+    row is scaled to -127..127 with its own scale factor). Returns the converted vectors and the scale per row (None
+    unless int8).
+    """
+    if dtype == "float32":
+        return vectors.astype(np.float32, copy=False), None
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype == "int8":
+        scale = np.abs(vectors).max(axis=1) / 127
+        scale[scale == 0] = 1
+        return np.round(vectors / scale[:, None]).astype(np.int8), scale.astype(np.float32)
+    raise Exception(f"Unknown vector type '{dtype}', choose 'float32', 'float16' or 'int8'.")
+
+
+def dequantize_rows(kv, indices):
+    """
+    Returns the given rows (index array or slice) of the vectors as float32 array, also if they are stored quantized.
+    """
+    rows = np.asarray(kv.vectors[indices])
+    if "scale" in kv.expandos:
+        return rows.astype(np.float32) * kv.expandos["scale"][indices][:, None]
+    return rows.astype(np.float32, copy=False)
+
+
+def export_keyed_vectors(model, output, words=None, dtype="float32"):
+    """
+    Saves only the word vectors of a model (no training state like syn1neg or the random generator) as KeyedVectors.
+    The vectors are stored already normalized to unit length and as a separate .npy file, so they can be memory-mapped
+    by load_vectors(). Creates the files output and output.vectors.npy.
+    If words is set, only these words of the model's vocabulary are exported.
+    dtype "float16" or "int8" stores the vectors quantized (see quantize_vectors).
+    """
+    kv = model.wv if hasattr(model, "wv") else model
+    if words is None:
+        indices = np.arange(len(kv.index_to_key))
+    else:
+        indices = np.array([kv.key_to_index[word] for word in words if word in kv.key_to_index], dtype=np.int64)
+    vectors, scale = quantize_vectors(kv.get_normed_vectors()[indices], dtype)
+    lean_kv = build_keyed_vectors([kv.index_to_key[index] for index in indices], vectors, get_counts(kv)[indices],
+                                  scale)
+    lean_kv.save(output, separately=["vectors"])
+    return output
+
+
+def load_vectors(path):
+    """
+    Loads vectors saved with export_keyed_vectors(). The vector matrix is memory-mapped read-only, so only the rows
+    which are actually used are read from disk.
+    Alignment files (.npz, see procrustes_align.align_and_save) are loaded with load_aligned_vectors().
+    """
+    if path.endswith(".npz"):
+        return load_aligned_vectors(path)
+    return KeyedVectors.load(path, mmap='r')
+
+
+def load_alignment(alignment_file):
+    """
+    Returns the content of an alignment file (rotation matrix, shared vocabulary rows, vector file names) as dictionary.
+    """
+    with np.load(alignment_file) as data:
+        return {key: data[key] for key in data.files}
+
+
+def load_aligned_vectors(alignment_file):
+    """
+    Loads the vectors of the aligned model from an alignment file: the rows of the shared vocabulary are read from the
+    memory-mapped vectors and rotated with the stored Procrustes matrix only now. Quantized vectors stay quantized.
+    """
+    alignment = load_alignment(alignment_file)
+    folder = os.path.dirname(alignment_file)
+    kv = KeyedVectors.load(os.path.join(folder, str(alignment["other_vectors"])), mmap='r')
+    indices = alignment["other_indices"]
+    rotated, scale = quantize_vectors(dequantize_rows(kv, indices).dot(alignment["ortho"]), str(kv.vectors.dtype))
+    return build_keyed_vectors([kv.index_to_key[index] for index in indices], rotated, get_counts(kv)[indices], scale)
+
+
+def compare_load_time(model_file):
+    """
+    Prints how long it takes to load a full Word2Vec model compared to its exported vectors.
+    """
+    start = time.perf_counter()
+    Word2Vec.load(model_file)
+    full_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    kv = load_vectors(f"{model_file}.kv")
+    kv.vectors.sum()  # touch all rows once, otherwise the memory-mapped file is not even read
+    lean_seconds = time.perf_counter() - start
+
+    print(f"{model_file}: Word2Vec.load {round(full_seconds, 3)} s, vectors only {round(lean_seconds, 3)} s")
+
+
+if __name__ == '__main__':
+
+    # export vectors of models which were trained/aligned before the export was part of the training/alignment
+    export_existing_models = True
+    check_load_time = False
+    vector_dtype = "float32"  # "float16" or "int8" to store the vectors with 2 or 4 times less memory
+
+    lang = ["es", "fr", "en"]
+    time_period = ["old", "new"]
+
+    if export_existing_models:
+        for l in lang:
+            model_files = [f"../models/model_{l}-{t}_vec300_win10_mc5_ep5" for t in time_period]
+            for model_file in model_files:
+                if os.path.exists(model_file):
+                    # quantized copies get their own file, the analysis scripts load the float32 vectors of model.kv
+                    output = f"{model_file}.kv" if vector_dtype == "float32" else f"{model_file}.{vector_dtype}.kv"
+                    export_keyed_vectors(Word2Vec.load(model_file), output, dtype=vector_dtype)
+                    print(f"Exported vectors of {model_file}.")
+
+    if check_load_time:
+        for l in lang:
+            compare_load_time(f"../models/model_{l}-new_vec300_win10_mc5_ep5")
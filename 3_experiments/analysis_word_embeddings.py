@@ -7,17 +7,19 @@
 
 import sys
 import os
-import gensim
 import networkx as nx
 import matplotlib.pyplot as plt
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "2_model-training_evaluation"))
+from model_registry import get_vectors
+from ann_index import get_ivf_index
 
 
 def plot_word_neighbors(model, target_word, model_name="test", color="lightblue"):
     """
     Creates a plot with the target word in the middle and around it words whose vectors have the highest cosine
-    similarity to the target word.
+    similarity to the target word. The model can be the vectors or their approximate neighbor index (ann_index.py).
     """
-    neighbors = model.wv.most_similar(target_word, topn=20)
+    neighbors = model.most_similar(target_word, topn=20)
 
     ###################################################
     # to just print closest neighbors with the same pos
@@ -56,21 +58,26 @@ if __name__ == '__main__':
     all_plots_in_cognates_list = True
     all_plots_in_word_list = False
     single_word_plot = False
+    use_ann_index = False  # approximate neighbor search instead of comparing with the whole vocabulary
 
-    wordlist = "../word_lists/cognate-list_en-fr-es_top-words.txt""
+    wordlist = "../word_lists/cognate-list_en-fr-es_top-words.txt"
     single_word = "computer_noun"
 
     lang = "fr"
-    model1 = f"../models/aligned_model_{lang}-old_vec300_win10_mc5_ep5"
-    model2 = f"../models/model_{lang}-new_vec300_win10_mc5_ep5"
+    model1 = f"../models/aligned_model_{lang}-old_vec300_win10_mc5_ep5.npz"
+    model2 = f"../models/model_{lang}-new_vec300_win10_mc5_ep5.kv"
 
 ##############################################################################################3
 
-    m1 = gensim.models.Word2Vec.load(model1)  # import already created models
-    m2 = gensim.models.Word2Vec.load(model2)
+    if use_ann_index:
+        m1 = get_ivf_index(model1)  # built on first use, then loaded
+        m2 = get_ivf_index(model2)
+    else:
+        m1 = get_vectors(model1)  # import already created models
+        m2 = get_vectors(model2)
 
-    model_name1 = model1.split("/")[-1]  # to save plotted figure with the model name
-    model_name2 = model2.split("/")[-1]
+    model_name1 = os.path.splitext(model1.split("/")[-1])[0]  # to save plotted figure with the model name
+    model_name2 = os.path.splitext(model2.split("/")[-1])[0]
 
     # give plots from the older and newer corpora different colors to distinguish them
     plot_color1 = "lightblue"
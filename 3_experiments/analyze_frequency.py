@@ -6,84 +6,161 @@
 # Detecting Semantic Shift with Word Embeddings
 
 
-from find_most_changed import find_most_changed_words
-from collections import Counter
 import os
+import sys
 import json
-from statistics import stdev
-from statistics import variance
+import time
+import numpy as np
+from scipy.sparse import csr_matrix, diags
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "2_model-training_evaluation"))
+from find_most_changed import find_most_changed_words
+from change_score_table import change_table_path
 
 
-def build_corpus_book_separated(folder_path):
+def book_tokens(data):
     """
-    Put all json files in designated folder together as list of lists, each list being one json file /book from
-    eltec corpus.
+    Returns all tokens of a processed book (sentences saved as token lists or as [token list, raw sentence]).
     """
-    all_books = []
-    for filename in os.listdir(folder_path):
-        if filename.endswith('.json'):  # Process only JSON files
-            file_path = os.path.join(folder_path, filename)
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                book = []
-                for sent in data:
-                    for word in sent:
-                        book.append(word)
-                all_books.append(book)
-    return all_books
+    for sent in data:
+        tokens = sent[0] if sent and isinstance(sent[0], list) else sent
+        for word in tokens:
+            yield word
 
 
-def word_distribution(corpus, words):
+def build_book_matrix(folder_path):
+    """
+    Counts the words of all json files (books of the eltec corpus) in the designated folder into a sparse matrix with
+    one row per book and one column per word (vocabulary sorted alphabetically), and saves it in the folder
+    (book_counts.npz).
+    """
+    start = time.perf_counter()
+    books = sorted(filename for filename in os.listdir(folder_path) if filename.endswith('.json'))
+    word_ids = {}
+    rows, columns, counts = [], [], []
+    for book_id, filename in enumerate(books):
+        with open(os.path.join(folder_path, filename), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        ids = np.fromiter((word_ids.setdefault(word, len(word_ids)) for word in book_tokens(data)), dtype=np.int64)
+        book_columns, book_counts = np.unique(ids, return_counts=True)
+        rows.append(np.full(len(book_columns), book_id))
+        columns.append(book_columns)
+        counts.append(book_counts)
+
+    vocabulary = np.array(list(word_ids))
+    order = np.argsort(vocabulary)
+    new_ids = np.empty(len(order), dtype=np.int64)
+    new_ids[order] = np.arange(len(order))
+    matrix = csr_matrix((np.concatenate(counts), (np.concatenate(rows), new_ids[np.concatenate(columns)])),
+                        shape=(len(books), len(vocabulary)), dtype=np.int64)
+    np.savez(os.path.join(folder_path, "book_counts.npz"), data=matrix.data, indices=matrix.indices,
+             indptr=matrix.indptr, shape=matrix.shape, vocabulary=vocabulary[order], books=np.array(books))
+    print(f"Counted {len(vocabulary)} words in {len(books)} books of {folder_path} "
+          f"in {round(time.perf_counter() - start, 2)} s.")
+
+
+def load_book_matrix(folder_path):
+    """
+    Returns the book x word count matrix of a folder and its vocabulary (built first if it does not exist yet or a book
+    was changed since).
+    """
+    matrix_file = os.path.join(folder_path, "book_counts.npz")
+    books_time = max(os.path.getmtime(os.path.join(folder_path, filename)) for filename in os.listdir(folder_path)
+                     if filename.endswith('.json'))
+    if not os.path.exists(matrix_file) or os.path.getmtime(matrix_file) < books_time:
+        build_book_matrix(folder_path)
+    with np.load(matrix_file) as data:
+        matrix = csr_matrix((data["data"], data["indices"], data["indptr"]), shape=tuple(data["shape"]))
+        return matrix, data["vocabulary"]
+
+
+def word_columns(book_counts, words=None):
+    """
+    Returns the columns of the given words (all words if None) as sparse matrix, words which never appear in the corpus
+    get a column of zeros.
+    """
+    matrix, vocabulary = book_counts
+    if words is None:
+        return matrix
+    words = np.array(words, dtype=str)
+    positions = np.searchsorted(vocabulary, words).clip(max=len(vocabulary) - 1)
+    found = vocabulary[positions] == words
+    selection = csr_matrix((np.ones(found.sum()), (positions[found], np.flatnonzero(found))),
+                           shape=(len(vocabulary), len(words)))
+    return matrix.dot(selection)
+
+
+def frequency_statistics(book_counts, words=None):
+    """
+    Calculates for each word (all words if None) with column operations on the sparse count matrix:
+    - books: in how many books the word appears
+    - total: total frequency across all books
+    - per_10k: frequency per 10,000 tokens in each book (books x words)
+    - mean, stdev, variance: mean and dispersion of the per-10k frequency across books (nan with less than two books)
+    """
+    matrix = book_counts[0]
+    columns = word_columns(book_counts, words).tocsc()
+    book_sizes = np.asarray(matrix.sum(axis=1)).ravel()
+    per_10k = diags(10000 / book_sizes).dot(columns)
+    n_books = matrix.shape[0]
+
+    mean = np.asarray(per_10k.sum(axis=0)).ravel() / n_books
+    squares = np.asarray(per_10k.multiply(per_10k).sum(axis=0)).ravel()
+    if n_books < 2:  # the sample variance is not defined for one book (statistics.variance raises an error)
+        variance = np.full(len(mean), np.nan)
+    else:
+        variance = (squares - n_books * mean ** 2) / (n_books - 1)  # sample variance, as statistics.variance
+    return {"books": columns.getnnz(axis=0),
+            "total": np.asarray(columns.sum(axis=0)).ravel().astype(np.int64),
+            "per_10k": per_10k,
+            "mean": mean,
+            "stdev": np.sqrt(variance.clip(min=0)),
+            "variance": variance}
+
+
+def word_distribution(book_counts, words):
     """
     Calculate word distribution across books.
     """
-    word_count = {word: 0 for word in words}
-    for book in corpus:
-        unique_words_in_book = set(book)
-        for word in words:
-            if word in unique_words_in_book:
-                word_count[word] += 1
-    return word_count
+    return dict(zip(words, frequency_statistics(book_counts, words)["books"].tolist()))
 
 
-def total_frequency(corpus, words):
+def total_frequency(book_counts, words):
     """
     Calculate total frequency across all books.
     """
-    word_freq = Counter()
-    for book in corpus:
-        word_freq.update(book)
-    return {word: word_freq[word] for word in words}
+    return dict(zip(words, frequency_statistics(book_counts, words)["total"].tolist()))
+
+
+def frequency_dispersion(book_counts, words):
+    """
+    Calculate mean and standard deviation of the frequency per 10,000 tokens across books.
+    """
+    statistics = frequency_statistics(book_counts, words)
+    return {word: (float(mean), float(stdev))
+            for word, mean, stdev in zip(words, statistics["mean"], statistics["stdev"])}
 
 
-def word_frequencies_per_book(corpus, words):
+def word_frequencies_per_book(book_counts, words):
     """
     Function to calculate word frequencies in each book.
     """
-    word_frequencies = {word: [] for word in words}
-    for book in corpus:
-        book_counter = Counter(book)  # Count occurrences of words in the book
-        book_tot = len(book)
-        for word in words:
-            tf = book_counter[word]/book_tot*10000
-            word_frequencies[word].append(round(tf, 3))  # Append the count for the word
-    return word_frequencies
+    per_10k = frequency_statistics(book_counts, words)["per_10k"].toarray().round(3)
+    return {word: per_10k[:, i].tolist() for i, word in enumerate(words)}
 
 
 if __name__ == '__main__':
     lang = "es"
-    model1 = f"../models/model_{lang}-new_vec300_win10_mc5_ep5"
-    model2 = f"../models/aligned_model_{lang}-old_vec300_win10_mc5_ep5"
+    change_table = change_table_path(lang, "vec300_win10_mc5_ep5")
     word_list = f'../word_lists/top_words_{lang}_with-pos_only-content.txt'
 
     folder_path = f"../corpora/{lang}-novels/"
 
-    most_changed = find_most_changed_words(word_list, model1, model2, top_n=20)
+    most_changed = find_most_changed_words(word_list, change_table, top_n=20)
 
     most_changed_words = [ele[0] for ele in most_changed]
 
-    corpus1 = build_corpus_book_separated(f"{folder_path}old")
-    corpus2 = build_corpus_book_separated(f"{folder_path}new")
+    corpus1 = load_book_matrix(f"{folder_path}old")
+    corpus2 = load_book_matrix(f"{folder_path}new")
 
     # Compute distribution for both corpora
     dist1 = word_distribution(corpus1, most_changed_words)
@@ -101,9 +178,15 @@ if __name__ == '__main__':
     freq1 = total_frequency(corpus1, most_changed_words)
     freq2 = total_frequency(corpus2, most_changed_words)
 
+    # Compute how evenly the words are spread over the books (frequency per 10,000 tokens)
+    dispersion1 = frequency_dispersion(corpus1, most_changed_words)
+    dispersion2 = frequency_dispersion(corpus2, most_changed_words)
+
     # Combine frequency and distribution data
     for word in most_changed_words:
         print(f"{word}:")
-        print(f"  Corpus1 - {dist1[word]} books, {freq1[word]} total occurrences")
-        print(f"  Corpus2 - {dist2[word]} books, {freq2[word]} total occurrences")
+        print(f"  Corpus1 - {dist1[word]} books, {freq1[word]} total occurrences, "
+              f"per 10k tokens: mean {round(dispersion1[word][0], 3)}, stdev {round(dispersion1[word][1], 3)}")
+        print(f"  Corpus2 - {dist2[word]} books, {freq2[word]} total occurrences, "
+              f"per 10k tokens: mean {round(dispersion2[word][0], 3)}, stdev {round(dispersion2[word][1], 3)}")
 
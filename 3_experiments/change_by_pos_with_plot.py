@@ -6,46 +6,73 @@
 # Detecting Semantic Shift with Word Embeddings
 
 import os
-import gensim
+import sys
+import numpy as np
 import matplotlib.pyplot as plt
-from compare_en_with_without_latin_origin import get_cosines_of_list
-import json
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "2_model-training_evaluation"))
+from analyze_frequency import load_book_matrix
+from change_score_table import change_table_path, load_change_table, lookup_scores
+from cosine_engine import print_oov_words, top_k_indices
 
+POS_CONTENT = ["adj", "adv", "noun", "verb", "propn", "intj"]
+POS_FUNCTION = ["part", "aux", "cconj", "sconj", "adp", "pron", "det", "num"]
 
-def count_word_occurrences(filename, top_n=500, filter_pos=False):
+
+def count_word_occurrences(folder_path, top_n=500, filter_pos=False):
     """
-    Take a tokenized and lemmatized corpus (as list of sentences) as input.
-    Then count lemmas and return a ranked frequency list of the n most common words.
+    Take the folder of the lemmatized books of a corpus as input (counted once into a sparse matrix, see
+    analyze_frequency.py).
+    Then return a ranked frequency list of the n most common words, the total number of tokens and of function words.
     """
-
-    tot_count = 0
-    function_count = 0
-    pos_function = ["part", "aux", "cconj", "sconj", "adp", "pron", "det", "num"]
-
-    word_collection = {}
-    with open(filename, 'r', encoding='utf-8') as f:
-        loaded_corpus = json.load(f)
-        for sent in loaded_corpus:
-            for token in sent:
-
-                if token in word_collection:
-                    word_collection[token] += 1
-                else:
-                    word_collection[token] = 1
-
-    for entry in word_collection.items():
-        if entry[0].split("_")[1] in pos_function:
-            function_count += entry[1]
-        tot_count += entry[1]
-
-    ranked_words = sorted(word_collection.items(), reverse=True, key=lambda item: item[1])
-    filtered_ranked_list = []
-    for i, tuple_token in enumerate(ranked_words):
-        if i <= top_n:
-            filtered_ranked_list.append(tuple_token)
+    matrix, vocabulary = load_book_matrix(folder_path)
+    totals = np.asarray(matrix.sum(axis=0)).ravel()
+    pos = np.char.rpartition(vocabulary, "_")[:, 2]
+    tot_count = int(totals.sum())
+    function_count = int(totals[np.isin(pos, POS_FUNCTION)].sum())
+
+    ranked = top_k_indices(totals, top_n + 1, largest=True)  # top_n + 1 words, as the list was cut after i <= top_n
+    filtered_ranked_list = [(str(vocabulary[i]), int(totals[i])) for i in ranked]
     return filtered_ranked_list, tot_count, function_count
 
 
+def encode_pos(words):
+    """
+    Encodes the POS tag of every word as integer code. The tags are numbered in order of their first appearance.
+    Returns the tags and the code of each word.
+    """
+    pos = np.char.rpartition(np.array(words, dtype=str), "_")[:, 2]
+    tags, first, codes = np.unique(pos, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    renumber = np.empty(len(order), dtype=np.int64)
+    renumber[order] = np.arange(len(order))
+    return tags[order], renumber[codes.ravel()]
+
+
+def group_statistics(codes, values, n_groups, quantiles=(0.25, 0.5, 0.75)):
+    """
+    Count, mean and quantiles of the values of every group (codes 0 to n_groups - 1), computed with bincount and one
+    sort instead of a list per group. Returns the counts, means, quantiles (one row per quantile) and the values of
+    each group.
+    """
+    if len(values) == 0:
+        return (np.zeros(n_groups, dtype=np.int64), np.full(n_groups, np.nan),
+                np.full((len(quantiles), n_groups), np.nan), [np.array([]) for _ in range(n_groups)])
+    counts = np.bincount(codes, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.bincount(codes, weights=values, minlength=n_groups) / counts
+
+    # sorted by group and then value, the quantiles are read at the right position within each group
+    sorted_values = np.asarray(values)[np.lexsort((values, codes))]
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    positions = np.outer(quantiles, np.maximum(counts - 1, 0))
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.ceil(positions).astype(np.int64)
+    low_values = sorted_values[(starts + lower).clip(max=len(sorted_values) - 1)]
+    high_values = sorted_values[(starts + upper).clip(max=len(sorted_values) - 1)]
+    group_quantiles = np.where(counts > 0, low_values + (high_values - low_values) * (positions - lower), np.nan)
+    return counts, means, group_quantiles, np.split(sorted_values, np.cumsum(counts)[:-1])
+
+
 def file_to_list(txt_file):
     """
     Returns the words at first position per line in a txt file as list of word.
@@ -79,8 +106,8 @@ def create_bar_chart(pos_list_mean_values, lang, output_name="test", choose_col=
     """
     values = []
     pos_tags = []
-    pos_content = ["adj", "adv", "noun", "verb", "propn", "intj"]
-    pos_function = ["part", "aux", "cconj", "sconj", "adp", "pron", "det", "num"]
+    pos_content = POS_CONTENT
+    pos_function = POS_FUNCTION
     for ele in pos_list_mean_values:
         values.append(ele[0])
         pos_tags.append(ele[1])
@@ -98,6 +125,8 @@ def create_bar_chart(pos_list_mean_values, lang, output_name="test", choose_col=
             colors.append(col[0])  # Content words
         elif pos in pos_function:
             colors.append(col[1])  # Function words
+        else:
+            colors.append("gray")  # Other tags (e.g. x, sym in the full vocabulary)
 
     plt.bar(pos_tags, values, color=colors, edgecolor="dimgray")
 
@@ -135,8 +164,8 @@ def create_boxplot(pos_list_scores, lang, output_name="test", choose_col="defaul
     Input: Dictionary with cosine similarity scores for each part of speech
     Output: A boxplot showing distributions for content and function words
     """
-    pos_content = ["adj", "adv", "noun", "verb", "propn", "intj"]
-    pos_function = ["part", "aux", "cconj", "sconj", "adp", "pron", "det", "num"]
+    pos_content = POS_CONTENT
+    pos_function = POS_FUNCTION
 
     # Prepare data for the boxplot
     means = {tag: sum(scores) / len(scores) for tag, scores in pos_list_scores.items()}
@@ -184,67 +213,42 @@ def create_boxplot(pos_list_scores, lang, output_name="test", choose_col="defaul
     plt.close()
 
 
-def compare_change_by_part_of_speech(wordlist, m1, m2, lang, plot):
+def compare_change_by_part_of_speech(wordlist, table_file, lang, plot):
     """
-    Input: A list of top words to be analyzed and two aligned models.
+    Input: A list of top words to be analyzed (or None for the whole shared vocabulary) and the change score table of
+    two aligned models.
     Output: A list and boxplot/bar plot showing the cosine similarity distributions for all words per part of speech.
     """
-    words = file_to_list(wordlist)
-    # words = wordlist
-    output = wordlist.split("/")[-1][:-4]
-    model1 = gensim.models.Word2Vec.load(m1)
-    model2 = gensim.models.Word2Vec.load(m2)
-    pos_tags = {}
-    words_with_scores = get_cosines_of_list(words, model1, model2, exclude_propn=False)
-
-    for ele in words_with_scores:
-        pos = ele[1].split("_")[1]
-        score = ele[0]
-        if pos in pos_tags:
-            pos_tags[pos].append(score)
-        else:
-            pos_tags[pos] = [score]
+    table = load_change_table(table_file)
+    if wordlist is None:
+        output = "full-vocabulary"
+        words, scores = table["word"], table["cosine"]
+    else:
+        output = wordlist.split("/")[-1][:-4]
+        words, scores, oov_words = lookup_scores(table, file_to_list(wordlist))
+        print_oov_words(oov_words)
+    if len(words) == 0:
+        print(f"No words of {wordlist} are in the change score table {table_file}.")
+        return
+
+    tags, codes = encode_pos(words)
+    counts, means, quantiles, group_scores = group_statistics(codes, scores, len(tags))
 
     if plot == "barplot":
-        pos_mean_scores = []
-        for pos in pos_tags.items():
-            pos_count = len(pos[1])
-            mean = sum(pos[1]) / pos_count
-            pos_mean_scores.append([mean, pos[0], pos_count])
+        pos_mean_scores = [[means[i], tags[i], counts[i]] for i in range(len(tags))]
         create_bar_chart(pos_mean_scores, lang, output)
 
     if plot == "boxplot":
-        create_boxplot(pos_tags, lang, output)
+        create_boxplot({tags[i]: group_scores[i] for i in range(len(tags))}, lang, output)
         print(f"Cosine similarity distributions for each part of speech tag in {lang}\n")
-        for pos, scores in pos_tags.items():
-            print(f"{pos}:\tMean = {round(sum(scores) / len(scores), 3)}, Count = {len(scores)}")
+        for i, pos in enumerate(tags):
+            print(f"{pos}:\tMean = {round(means[i], 3)}, Count = {counts[i]}")
         print(60 * "-")
 
     if plot == "print":
-        pos_mean_scores = []
-        for pos in pos_tags.items():
-            pos_count = len(pos[1])
-            mean = sum(pos[1]) / pos_count
-            pos_mean_scores.append([mean, pos[0], pos_count])
-
-        pos_content = ["adj", "adv", "noun", "verb", "propn", "intj"]
-        pos_function = ["part", "aux", "cconj", "sconj", "adp", "pron", "det", "num"]
-
-        tot_content = []
-        score_content = 0
-        tot_function = []
-        score_function = 0
-
-        for ele in pos_mean_scores:
-            if ele[1] in pos_content:
-                tot_content.append(ele[0])
-                score_content+=ele[0]
-            if ele[1] in pos_function:
-                tot_function.append(ele[0])
-                score_function+=ele[0]
-
-        mean_content = score_content/len(tot_content)
-        mean_function = score_function/len(tot_function)
+        # content vs. function words: mean of the POS means of each group
+        mean_content = means[np.isin(tags, POS_CONTENT)].mean()
+        mean_function = means[np.isin(tags, POS_FUNCTION)].mean()
         diff = mean_function-mean_content
         print(50 * ".")
         print(f"Mean content words: {mean_content}")
@@ -252,21 +256,19 @@ def compare_change_by_part_of_speech(wordlist, m1, m2, lang, plot):
         print(f"Difference: {diff}")
         print(50*".")
         ###############################################################################
-        pos_mean_scores.sort()
-        #create_bar_chart(pos_mean_scores, lang, output)
         print(f"Average cosine similarities for each part of speech tag in {lang}\n")
-        print("Word\tMean\tTotal Counts\n")
-        for ele in pos_mean_scores:
-            print(f"{ele[1]}:\t{round(ele[0], 3)}\t{ele[2]}")
+        print("Word\tMean\tTotal Counts\tQ1\tMedian\tQ3\n")
+        for i in np.argsort(means):
+            print(f"{tags[i]}:\t{round(means[i], 3)}\t{counts[i]}\t{round(quantiles[0, i], 3)}\t"
+                  f"{round(quantiles[1, i], 3)}\t{round(quantiles[2, i], 3)}")
         print(60 * "-")
 
-
 ######################################################################
 if __name__ == '__main__':
 
     pos_plot = False
     pos_analysis = True
-    pos_count = False
+    pos_counts = False
 
     plot_setting = "barplot"
     # plot_setting = "boxplot"
@@ -274,37 +276,24 @@ if __name__ == '__main__':
 
     if pos_plot:
         lang = "es"
-        model1 = f"../models/aligned_model_{lang}-old_vec300_win10_mc5_ep5"
-        model2 = f"../models/model_{lang}-new_vec300_win10_mc5_ep5"
+        change_table = change_table_path(lang, "vec300_win10_mc5_ep5")
         word_list = f"../word_lists/most_frequent_words/top1000_words_{lang}_with-pos2.txt"
 
-        compare_change_by_part_of_speech(word_list, model1, model2, lang, plot_setting)
+        compare_change_by_part_of_speech(word_list, change_table, lang, plot_setting)
 
     if pos_counts:
-        time = "old"
         lang = "en"
         top_n = 1000
-        filename = f"../corpora/{lang}-{time}_tokenized.json"
-        word_list1, tot1, function1 = count_word_occurrences(filename, top_n, filter_pos=False)
-        time = "new"
-        filename = f"../corpora/{lang}-{time}_tokenized.json"
-        word_list2, tot2, function2 = count_word_occurrences(filename, top_n, filter_pos=False)
-
-        matching_lines = []
-        for ele in word_list1:
-            for x in word_list2:
-                if ele[0]==x[0]:
-                    score = ele[1]+x[1]
-                    matching_lines.append([ele[0], score])
-
-        pos_tags = {}
-        x_tags = []
-        for ele in matching_lines:
-            pos = ele[0].split("_")[1]
-            if pos not in pos_tags:
-                pos_tags[pos] = ele[1]
-            else:
-                pos_tags[pos] += ele[1]
+        word_list1, tot1, function1 = count_word_occurrences(f"../corpora/{lang}-novels/old", top_n, filter_pos=False)
+        word_list2, tot2, function2 = count_word_occurrences(f"../corpora/{lang}-novels/new", top_n, filter_pos=False)
+
+        # join the two lists on the word with a dictionary instead of comparing every pair
+        counts2 = dict(word_list2)
+        matching_lines = [[word, count + counts2[word]] for word, count in word_list1 if word in counts2]
+
+        tags, codes = encode_pos([ele[0] for ele in matching_lines])
+        pos_sums = np.bincount(codes, weights=[ele[1] for ele in matching_lines], minlength=len(tags))
+        pos_tags = {str(tag): int(total) for tag, total in zip(tags, pos_sums)}
         print(pos_tags)
         tot_count = tot1+tot2
         function_count = function2 + function1
@@ -312,5 +301,3 @@ if __name__ == '__main__':
         print(tot_count)
         print(function_count)
         print(function_percent)
-
-
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Seraina Betschart
+# date: 01.12.2024
+# Bachelor Thesis
+# Detecting Semantic Shift with Word Embeddings
+
+import os
+import sys
+import time
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "2_model-training_evaluation"))
+from model_registry import get_vectors
+from ann_index import get_ivf_index
+from cosine_engine import blocked_top_k_neighbors, get_rows, word_indices, print_oov_words
+from crosslingual_align import read_cognate_list, COGNATE_COLUMNS
+
+
+def closest_neighbors(kv, words, topn=20, same_pos=True, block_size=None, index=None):
+    """
+    Returns the topn closest neighbors of every word as dictionary word -> list of neighbors (closest first).
+    All words are compared with the whole vocabulary in one blocked matrix pass (or searched in the approximate
+    neighbor index, if given). With same_pos=True only the neighbors with the same POS tag as the word are kept.
+    Words which are not in the vocabulary are skipped.
+    """
+    indices = word_indices(kv, words)
+    queries = indices[indices >= 0]
+    if index is None:
+        neighbors = blocked_top_k_neighbors(get_rows(kv, queries), kv, topn, block_size, query_indices=queries)
+    else:
+        neighbors = np.full((len(queries), topn), -1, dtype=np.int64)
+        for i, (rows, scores) in enumerate(index.search(get_rows(kv, queries), topn, exclude=queries)):
+            neighbors[i, :len(rows)] = rows
+
+    # POS filter as one mask over the whole neighbor matrix
+    keys = np.array(kv.index_to_key)
+    keep = neighbors >= 0
+    if same_pos:
+        pos = np.char.rpartition(keys, "_")[:, 2]
+        keep &= pos[neighbors] == pos[queries][:, None]
+    found_words = [word for word, index in zip(words, indices) if index >= 0]
+    return {word: list(keys[neighbors[i][keep[i]]]) for i, word in enumerate(found_words)}
+
+
+def write_neighbor_report(words, neighbors_old, neighbors_new, output_file):
+    """
+    Writes the neighbors of each word in the old and the new model below each other (without POS tags), and the
+    neighbors which the models share or only one of them has into a second, tab separated file (output_file with
+    "_differences.tsv" instead of ".txt").
+    """
+    words = [word for word in words if word in neighbors_old and word in neighbors_new]
+    with open(output_file, 'w', encoding='utf-8') as file:
+        for word in words:
+            for period, neighbors in (("old", neighbors_old[word]), ("new", neighbors_new[word])):
+                file.write(f"{40 * '-'}\n{word}: {period}\n{40 * '-'}\n")
+                for neighbor in neighbors:
+                    file.write(f"{neighbor.split('_')[0]}\n")
+
+    with open(f"{output_file[:-4]}_differences.tsv", 'w', encoding='utf-8') as file:
+        file.write("word\tshared neighbors\tonly old\tonly new\n")
+        for word in words:
+            old, new = neighbors_old[word], neighbors_new[word]
+            shared = [neighbor for neighbor in old if neighbor in new]
+            only_old = [neighbor for neighbor in old if neighbor not in new]
+            only_new = [neighbor for neighbor in new if neighbor not in old]
+            file.write(f"{word}\t{', '.join(shared)}\t{', '.join(only_old)}\t{', '.join(only_new)}\n")
+
+
+def neighbor_report(words, model_old, model_new, output_file, topn=20, same_pos=True, use_ann_index=False):
+    """
+    Computes the closest neighbors of all words in the old and the new model and writes the report.
+    """
+    start = time.perf_counter()
+    neighbors = []
+    for model in (model_old, model_new):
+        index = get_ivf_index(model) if use_ann_index else None
+        neighbors.append(closest_neighbors(get_vectors(model), words, topn, same_pos, index=index))
+    print_oov_words([word for word in words if word not in neighbors[0] or word not in neighbors[1]])
+
+    if not os.path.exists(os.path.dirname(output_file)):  # check if the folder exists, else create it
+        os.makedirs(os.path.dirname(output_file))
+    write_neighbor_report(words, neighbors[0], neighbors[1], output_file)
+    print(f"Closest neighbors of {len(words)} words written to {output_file} "
+          f"in {round(time.perf_counter() - start, 2)} s.")
+
+
+if __name__ == '__main__':
+
+    use_ann_index = False
+
+    cognate_file = "../word_lists/cognates/4_cognate-list_en-fr-es_top-words.txt"
+    languages = ["en", "fr", "es"]
+    model_suffix = "vec300_win10_mc5_ep5"
+
+    cognates = read_cognate_list(cognate_file)
+    for lang in languages:
+        # the neighbors within one model do not depend on the alignment, so the unaligned old vectors are used
+        neighbor_report([cognate[lang] for cognate in cognates],
+                        f"../models/model_{lang}-old_{model_suffix}.kv",
+                        f"../models/model_{lang}-new_{model_suffix}.kv",
+                        f"../results/closest_neighbors_of_cognates_{lang}.txt",
+                        use_ann_index=use_ann_index)
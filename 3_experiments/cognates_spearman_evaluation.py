@@ -6,6 +6,7 @@
 # Detecting Semantic Shift with Word Embeddings
 
 from scipy.stats import spearmanr
+from significance_tests import run_comparisons, print_result
 
 
 def spearman_calc(list1, list2):
@@ -88,6 +89,14 @@ def cognates_spearman_evaluation(file):
     print("p-value:", pval)
     print("\n")
 
+    # robust significance: 10,000 bootstrap and permutation resamples per language pair, pairs in parallel
+    results = run_comparisons([("en-fr", "spearman", en_scores, fr_scores, {"seed": 1}),
+                               ("en-es", "spearman", en_scores, es_scores, {"seed": 2}),
+                               ("fr-es", "spearman", fr_scores, es_scores, {"seed": 3})])
+    print("Spearman's correlation with bootstrap confidence interval and permutation test:")
+    for name, result in results.items():
+        print_result(name, result)
+
 
 if __name__ == '__main__':
     cognates_spearman_evaluation(f"../word_lists/cognate_list_all_lang_cosine_scores_vec300_win10_mc5_ep5.txt")
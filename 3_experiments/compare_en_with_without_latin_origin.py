@@ -5,19 +5,14 @@
 # Bachelor Thesis
 # Detecting Semantic Shift with Word Embeddings
 
-import gensim
-import numpy as np
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "2_model-training_evaluation"))
+from cosine_engine import print_oov_words
+from change_score_table import change_table_path, load_change_table, lookup_scores
 
 from scipy.stats import ttest_ind
-
-
-def calculate_cosine(vector1, vector2):
-    """
-    Formula for cosine similarity
-    """
-    cosine_similarity = np.dot(vector1, vector2) / (
-            np.linalg.norm(vector1) * np.linalg.norm(vector2))
-    return cosine_similarity
+from significance_tests import mean_difference_significance, print_result
 
 
 def file_to_list(txt_file):
@@ -33,22 +28,16 @@ def file_to_list(txt_file):
     return wordlist
 
 
-def get_cosines_of_list(word_list, model1, model2, exclude_propn=True):
+def get_cosines_of_list(word_list, table, exclude_propn=True):
     """
-    Calculate all cosine similarities of words in list
+    Look up the cosine similarities of all words in list in a change score table (words missing in one of the models
+    are skipped)
     """
-    cosine_similarities = []
-    for word in word_list:
-        if word in model1.wv and word in model2.wv:
-            vec1 = model1.wv[word]
-            vec2 = model2.wv[word]
-            cos_sim = calculate_cosine(vec1, vec2)
-            if exclude_propn:
-                if word[-5:] != "propn":  # to exclude proper nouns
-                    cosine_similarities.append([cos_sim, word])
-            else:
-                cosine_similarities.append([cos_sim, word])
-    return cosine_similarities
+    if exclude_propn:
+        word_list = [word for word in word_list if word[-5:] != "propn"]  # to exclude proper nouns
+    scored_words, scores, oov_words = lookup_scores(table, word_list)
+    print_oov_words(oov_words)
+    return [[score, word] for score, word in zip(scores, scored_words)]
 
 
 def average_change(cosine_list):
@@ -79,19 +68,22 @@ def t_test(cos_scores1, cos_scores2):
 
     print(f"\n{80*'-'}\nT-test: t-statistic={t_stat}, p-value={p_value}\n{80*'-'}")
 
+    # the t-test assumes normally distributed scores, bootstrap and permutation test do not
+    print_result("Mean difference of cosine similarity", mean_difference_significance(group1, group2))
+    print(80 * '-')
+
 
-def compare_change_in_en_words(top_words, top_lat_words, m1, m2, top_n=10):
+def compare_change_in_en_words(top_words, top_lat_words, table_file, top_n=10):
     """
     Inputs:
     -   a list of top en words to analyse in the form of a txt file
     -   a list of all top en words with latin origin (also txt file)
-    -   two aligned models
+    -   the change score table of two aligned models (see change_score_table.py)
     -   number of words to print
     This function returns the n most and least changed words among English words without Latin origin,
     as well as English words with Latin origin. Also returns their average change.
     """
-    model1 = gensim.models.Word2Vec.load(m1)
-    model2 = gensim.models.Word2Vec.load(m2)
+    table = load_change_table(table_file)
     other_words = [] # all En top words which are not of Lat origin
     all_words = file_to_list(top_words)
     lat_words = file_to_list(top_lat_words)
@@ -99,8 +91,8 @@ def compare_change_in_en_words(top_words, top_lat_words, m1, m2, top_n=10):
         if word not in lat_words:
             other_words.append(word)
 
-    cosine_other_words = get_cosines_of_list(other_words, model1, model2)
-    cosine_lat_words = get_cosines_of_list(lat_words, model1, model2)
+    cosine_other_words = get_cosines_of_list(other_words, table)
+    cosine_lat_words = get_cosines_of_list(lat_words, table)
     # Sort words by cosine similarity, having words with lowest similarity first
     cosine_other_words.sort()
     cosine_lat_words.sort()
@@ -133,13 +125,12 @@ def compare_change_in_en_words(top_words, top_lat_words, m1, m2, top_n=10):
 
 if __name__ == '__main__':
 
-    model1 = f"../models/model_en-new_vec300_win10_mc5_ep5"
-    model2 = f"../models/aligned_model_en-old_vec300_win10_mc5_ep5"
+    change_table = change_table_path("en", "vec300_win10_mc5_ep5")
     word_list_all_top = f'../word_lists/top_words_en_with-pos_only-content.txt'
     word_list_lat_top = f'../word_lists/en_top-words_with_latin_roots_only-content_manual-filtered.txt'
 
     compare_change_in_en_words(top_words=word_list_all_top, top_lat_words=word_list_lat_top,
-                               m1=model1, m2=model2, top_n=10)
+                               table_file=change_table, top_n=10)
 
 
 
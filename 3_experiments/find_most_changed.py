@@ -5,17 +5,11 @@
 # Bachelor Thesis
 # Detecting Semantic Shift with Word Embeddings
 
-import gensim
-import numpy as np
-
-
-def calculate_cosine(vector1, vector2):
-    """
-    Formula for cosine similarity
-    """
-    cosine_similarity = np.dot(vector1, vector2) / (
-            np.linalg.norm(vector1) * np.linalg.norm(vector2))
-    return cosine_similarity
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "2_model-training_evaluation"))
+from cosine_engine import print_oov_words, top_k_indices
+from change_score_table import change_table_path, load_change_table, filter_change_table, lookup_scores
 
 
 def file_to_list(txt_file):
@@ -31,31 +25,23 @@ def file_to_list(txt_file):
     return wordlist
 
 
-def find_most_changed_words(wordlist, m1, m2, top_n=10):
+def find_most_changed_words(wordlist, table_file, top_n=10):
     """
     Inputs:
     -   a list of words to analyse in the form of a txt file
-    -   two aligned models
+    -   the change score table of two aligned models (see change_score_table.py)
     -   number of words to print
     This function returns the n most changed words from the input word list by measuring the cosine distance between the
     vectors of each model of a word.
     """
-    # Load Word2Vec models
-    model1 = gensim.models.Word2Vec.load(m1)
-    model2 = gensim.models.Word2Vec.load(m2)
+    table = load_change_table(table_file)
     words = file_to_list(wordlist)
-    cosine_similarities = {}
-    for word in words:
-        if word[-5:] != "propn": # to exclude proper nouns
-
-            if word in model1.wv and word in model2.wv:
-                vec1 = model1.wv[word]
-                vec2 = model2.wv[word]
-                cos_sim = calculate_cosine(vec1, vec2)
-                cosine_similarities[word] = cos_sim
+    words = [word for word in words if word[-5:] != "propn"]  # to exclude proper nouns
+    scored_words, scores, oov_words = lookup_scores(table, words)
+    print_oov_words(oov_words)
 
     # Sort words by cosine similarity, having words with lowest similarity first
-    most_changed_words = sorted(cosine_similarities.items(), key=lambda x: x[1])[:top_n]
+    most_changed_words = [(scored_words[index], scores[index]) for index in top_k_indices(scores, top_n)]
     print(f"Top {top_n} words that changed the most:")
     for word, dist in most_changed_words:
         print(f"{word}: {dist}")
@@ -64,12 +50,55 @@ def find_most_changed_words(wordlist, m1, m2, top_n=10):
     return most_changed_words
 
 
+def rank_full_vocabulary(table_file, top_k=20, pos_tags=None, min_count=None, exclude_propn=True, measure="cosine"):
+    """
+    Inputs:
+    -   the change score table of two aligned models (see change_score_table.py)
+    -   number of words to return
+    -   optionally a list of POS tags to keep (e.g. ["noun", "verb"]) and a minimum count the word needs in both models
+    -   the change measure: "cosine" or "knn_overlap" (overlap of the nearest neighbors)
+    Instead of a preselected word list, every word of the shared vocabulary of both models is ranked.
+    Returns the top_k most changed and the top_k least changed words (selected with a partial sort).
+    """
+    table = filter_change_table(load_change_table(table_file), pos_tags=pos_tags,
+                                exclude_pos=["propn"] if exclude_propn else None,  # to exclude proper nouns
+                                min_count=min_count)
+    if measure not in table:
+        raise Exception(f"The table {table_file} has no '{measure}' column, build it with neighbor_k set "
+                        f"(see change_score_table.py).")
+    words = table["word"]
+    scores = table[measure]
+
+    most_changed = [(words[index], scores[index]) for index in top_k_indices(scores, top_k)]
+    least_changed = [(words[index], scores[index]) for index in top_k_indices(scores, top_k, largest=True)]
+
+    print(f"{len(words)} words scored.\nTop {top_k} words that changed the most:")
+    for word, dist in most_changed:
+        print(f"{word}: {dist}")
+    print(f"\nTop {top_k} words that changed the least:")
+    for word, dist in least_changed:
+        print(f"{word}: {dist}")
+    return most_changed, least_changed
+
+
 if __name__ == '__main__':
 
+    word_list_ranking = True
+    full_vocabulary_ranking = False
+    knn_overlap_ranking = False  # needs the knn_overlap column: build the tables with neighbor_k set
+
     lang = "es"
-    model1 = f"../models/model_{lang}-new_vec300_win10_mc5_ep5"
-    model2 = f"../models/aligned_model_{lang}-old_vec300_win10_mc5_ep5"
+    # created with change_score_table.py from the new and the aligned old model
+    change_table = change_table_path(lang, "vec300_win10_mc5_ep5")
     word_list = f'../word_lists/top_words_{lang}_with-pos_only-content.txt'
 
-    find_most_changed_words(word_list, model1, model2)
+    if word_list_ranking:
+        find_most_changed_words(word_list, change_table)
+
+    if full_vocabulary_ranking:
+        rank_full_vocabulary(change_table, top_k=20, pos_tags=["noun", "verb", "adj", "adv"], min_count=20)
+
+    if knn_overlap_ranking:
+        rank_full_vocabulary(change_table, top_k=20, pos_tags=["noun", "verb", "adj", "adv"], min_count=20,
+                             measure="knn_overlap")
 
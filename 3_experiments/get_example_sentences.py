@@ -5,9 +5,10 @@
 # Bachelor Thesis
 # Detecting Semantic Shift with Word Embeddings
 
-import random
-import json
-import re
+import os
+import numpy as np
+from sentence_index import (load_sentence_index, sample_sentences, word_occurrences, reservoir_sample,
+                            read_sentences, sentence_tokens)
 
 
 def file_to_list(txt_file):
@@ -24,18 +25,13 @@ def file_to_list(txt_file):
     return wordlist
 
 
-def search_and_print_example_sent(sent_list, word, num_sent=10):
-    found_sent = 0
-    for ele in sent_list:
-        if found_sent == num_sent:  # only print the chosen number of sentences, then stop searching
-            break
-        else:
-            if word in ele[0]:
-                if 5 < len(ele[0]) < 40:  # not have too short sentences but also not whole paragraphs
-                    print(found_sent+1)
-                    cleaned_sent = re.sub(r'\s+', ' ', ele[1])  # get rid of unnecessary whitespaces
-                    print(cleaned_sent)
-                    found_sent += 1
+def search_and_print_example_sent(index, word, num_sent=10):
+    """
+    Prints num_sent random sentences of a corpus in which the word appears, looked up in the sentence index.
+    """
+    for i, sentence in enumerate(sample_sentences(index, word, num_sent)):
+        print(i+1)
+        print(sentence)
     print(80 * "-")
 
 
@@ -44,25 +40,58 @@ def get_examples(corpus1, corpus2, wordlist, num=10):
     Goes through every word in list of words and prints n=num example sentences from each of the two corpora in which
     the word appears.
     """
-    with open(corpus1, 'r', encoding='utf-8') as f:
-        sent_list1 = json.load(f)
-    random.shuffle(sent_list1)
+    index1 = load_sentence_index(corpus1)  # built once per corpus, then loaded
+    index2 = load_sentence_index(corpus2)
 
-    with open(corpus2, 'r', encoding='utf-8') as f:
-        sent_list2 = json.load(f)
-    random.shuffle(sent_list2)
-
-    target_word = "caballero_noun"
     for word in wordlist:
         print(f"{num} example sentences for word {word}\n")
         print(f"from corpus {corpus1}\n")
-        search_and_print_example_sent(sent_list1, word, num)
+        search_and_print_example_sent(index1, word, num)
         print(f"from corpus {corpus2}\n")
-        search_and_print_example_sent(sent_list2, word, num)
+        search_and_print_example_sent(index2, word, num)
+
+
+def lemmas(index, positions):
+    """
+    Returns the tokens at the given vocabulary positions as lemmas without POS tag, separated by spaces.
+    """
+    return " ".join(token.rsplit("_", 1)[0] for token in index["vocabulary"][positions])
+
+
+def export_concordances(corpora, wordlist, output_file, num=20, window=8, seed=42):
+    """
+    Input: The corpora of the periods as dictionary period -> corpus (file or folder of processed books, see
+    sentence_index.py), a list of words, the output file.
+    Writes keyword-in-context lines (window lemmas left and right of the word, the book and the full sentence) for up
+    to num random occurrences of every word in every period into one tab separated file. The occurrences are sampled
+    with one reservoir of size num per word, so the memory does not grow with the frequency of the word.
+    """
+    rng = np.random.default_rng(seed)
+    if os.path.dirname(output_file) and not os.path.exists(os.path.dirname(output_file)):
+        os.makedirs(os.path.dirname(output_file))  # check if the folder exists, else create it
+
+    with open(output_file, 'w', encoding='utf-8') as file:
+        file.write("word\tperiod\tbook\tleft context\tkeyword\tright context\tsentence\n")
+        for period, corpus in corpora.items():
+            index = load_sentence_index(corpus)
+            for word in wordlist:
+                sample = sorted(reservoir_sample(word_occurrences(index, word), num, rng))
+                sentences = read_sentences(index, [sent_id for sent_id, position in sample])
+                for (sent_id, position), sentence in zip(sample, sentences):
+                    tokens = sentence_tokens(index, sent_id)
+                    book = index["books"][index["book_ids"][sent_id]]
+                    left = lemmas(index, tokens[max(0, position - window):position])
+                    keyword = lemmas(index, tokens[position:position + 1])
+                    right = lemmas(index, tokens[position + 1:position + 1 + window])
+                    file.write(f"{word}\t{period}\t{book}\t{left}\t{keyword}\t{right}\t{sentence}\n")
+    print(f"Concordances of {len(wordlist)} words written to {output_file}")
 
 
 if __name__ == '__main__':
 
+    print_examples = True
+    export_kwic = False
+
     lang = "en"
     corpus_old = f"../corpora/corpus_with_raw_sent/corpus_{lang}-old_tokenized.json"
     corpus_new = f"../corpora/corpus_with_raw_sent/corpus_{lang}-new_tokenized.json"
@@ -74,6 +103,13 @@ if __name__ == '__main__':
     print(word_list)
     num_of_examples = 10
 
-    get_examples(corpus_old, corpus_new, word_list, num_of_examples)
+    if print_examples:
+        get_examples(corpus_old, corpus_new, word_list, num_of_examples)
+
+    if export_kwic:
+        # the folders with one processed file per book (pre_process_corpora.py with raw sentences), to know the book
+        books = {period: f"../corpora/{lang}-novels/{period}" for period in ["old", "new"]}
+        export_concordances(books, file_to_list(word_list_file), f"../results/concordances_{lang}.tsv",
+                            num=20, window=8)
 
 
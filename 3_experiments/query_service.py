@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Seraina Betschart
+# date: 01.12.2024
+# Bachelor Thesis
+# Detecting Semantic Shift with Word Embeddings
+
+import os
+import sys
+import json
+import time
+import threading
+from collections import deque
+from functools import lru_cache
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "2_model-training_evaluation"))
+from model_registry import get_vectors
+from change_score_table import change_table_path, load_change_table, filter_change_table, lookup_scores
+from cosine_engine import top_k_indices
+from closest_neighbors_report import closest_neighbors
+
+MODEL_SUFFIX = "vec300_win10_mc5_ep5"
+tables = {}  # language -> change score table
+
+
+def model_file(lang, period):
+    """
+    Returns the vector file of a model. Neighbors do not depend on the alignment, so the unaligned vectors are used.
+    """
+    return f"../models/model_{lang}-{period}_{MODEL_SUFFIX}.kv"
+
+
+def query_cosine(lang, words):
+    """
+    /cosine?lang=en&words=moment_noun,voice_noun
+    Cosine similarity of each word between the old and the new model.
+    """
+    scored_words, scores, oov_words = lookup_scores(tables[lang], words.split(","))
+    return {"cosine": {word: float(score) for word, score in zip(scored_words, scores)}, "missing": oov_words}
+
+
+def query_neighbors(lang, period, words, topn="10", same_pos="false"):
+    """
+    /neighbors?lang=fr&period=old&words=voix_noun&topn=10&same_pos=true
+    Closest neighbors of each word in one model, all words in one matrix pass.
+    """
+    words = words.split(",")
+    neighbors = closest_neighbors(get_vectors(model_file(lang, period)), words, int(topn), same_pos == "true")
+    return {"neighbors": neighbors, "missing": [word for word in words if word not in neighbors]}
+
+
+def query_top_changed(lang, k="20", pos=None, min_count=None, measure="cosine", least="false"):
+    """
+    /top_changed?lang=es&pos=verb&k=20&min_count=20&measure=cosine
+    The k most (or with least=true the k least) changed words of the whole shared vocabulary, without proper nouns.
+    """
+    table = filter_change_table(tables[lang], pos_tags=pos.split(",") if pos else None, exclude_pos=["propn"],
+                                min_count=int(min_count) if min_count else None)
+    selected = top_k_indices(table[measure], int(k), largest=least == "true")
+    return {measure: [[str(table["word"][i]), float(table[measure][i])] for i in selected]}
+
+
+QUERIES = {"cosine": query_cosine, "neighbors": query_neighbors, "top_changed": query_top_changed}
+# endpoint -> response times in ms of the last 10000 requests; the handler threads only access it with the lock
+latencies = {endpoint: deque(maxlen=10000) for endpoint in QUERIES}
+latencies_lock = threading.Lock()
+
+
+@lru_cache(maxsize=4096)
+def cached_query(endpoint, parameters):
+    """
+    Answers a query; repeated queries (same endpoint and parameters) are answered from the cache.
+    """
+    return QUERIES[endpoint](**dict(parameters))
+
+
+def latency_stats():
+    """
+    /stats
+    Number of (recent) requests and median / 99th percentile response time per endpoint, and the cache usage.
+    """
+    with latencies_lock:
+        latency_copy = {endpoint: list(times) for endpoint, times in latencies.items()}
+    stats = {endpoint: {"requests": len(times),
+                        "p50_ms": round(float(np.percentile(times, 50)), 3),
+                        "p99_ms": round(float(np.percentile(times, 99)), 3)}
+             for endpoint, times in latency_copy.items() if times}
+    stats["cache"] = cached_query.cache_info()._asdict()
+    return stats
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    Answers GET requests with JSON.
+    """
+    def do_GET(self):
+        start = time.perf_counter()
+        url = urlparse(self.path)
+        endpoint = url.path.strip("/")
+        # one value per parameter, sorted so that the same query always hits the same cache entry
+        parameters = tuple(sorted((key, values[-1]) for key, values in parse_qs(url.query).items()))
+        status = 200
+        try:
+            if endpoint == "stats":
+                result = latency_stats()
+            elif endpoint in QUERIES:
+                result = cached_query(endpoint, parameters)
+            else:
+                status, result = 404, {"error": f"unknown endpoint '{endpoint}', use {', '.join(QUERIES)} or stats"}
+        except (KeyError, TypeError, ValueError) as error:
+            status, result = 400, {"error": repr(error)}
+        except Exception as error:
+            status, result = 500, {"error": repr(error)}
+
+        body = json.dumps(result, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        if endpoint in QUERIES:  # unknown paths are not recorded, so the latencies cannot grow without bound
+            with latencies_lock:
+                latencies[endpoint].append((time.perf_counter() - start) * 1000)
+
+    def log_message(self, format, *args):
+        pass  # no line per request in the terminal
+
+
+def serve(languages, periods=("old", "new"), port=8765):
+    """
+    Loads the change score tables and (memory-mapped) vectors of all languages once and answers queries on localhost
+    until the process is stopped.
+    """
+    for lang in languages:
+        tables[lang] = load_change_table(change_table_path(lang, MODEL_SUFFIX))
+        for period in periods:
+            get_vectors(model_file(lang, period))
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), QueryHandler)
+    print(f"Query service running on http://127.0.0.1:{port} (endpoints: {', '.join(QUERIES)}, stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(json.dumps(latency_stats(), indent=4))
+        server.server_close()
+
+
+if __name__ == '__main__':
+
+    serve(["en", "fr", "es"])
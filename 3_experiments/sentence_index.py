@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Seraina Betschart
+# date: 01.12.2024
+# Bachelor Thesis
+# Detecting Semantic Shift with Word Embeddings
+
+import os
+import re
+import json
+import time
+import numpy as np
+
+# the index files are kept apart from the corpora, so that pre_process_corpora.py (which processes every .txt file of a
+# novel folder) and the book readers never take them for books
+INDEX_FOLDER = "../corpora/index"
+
+
+def corpus_books(corpus):
+    """
+    Returns the json files of a corpus: the corpus file itself, or all processed books (processed_*.json) of a folder.
+    """
+    if os.path.isdir(corpus):
+        return sorted(os.path.join(corpus, filename) for filename in os.listdir(corpus)
+                      if filename.startswith("processed_") and filename.endswith(".json"))
+    return [corpus]
+
+
+def index_files(corpus):
+    """
+    Returns the paths of the index (.npz) and the sentence text file belonging to a corpus file or folder, in
+    INDEX_FOLDER (e.g. ../corpora/en-novels/old -> en-novels_old_index.npz, corpus_en-old_tokenized.json ->
+    corpus_en-old_tokenized_index.npz).
+    """
+    corpus = os.path.normpath(corpus)
+    if os.path.isdir(corpus):
+        name = f"{os.path.basename(os.path.dirname(corpus))}_{os.path.basename(corpus)}"
+    else:
+        name = os.path.basename(corpus)[:-5]
+    if not os.path.exists(INDEX_FOLDER):  # check if the folder exists, else create it
+        os.makedirs(INDEX_FOLDER)
+    base = os.path.join(INDEX_FOLDER, name)
+    return f"{base}_index.npz", f"{base}_sentences.txt"
+
+
+def build_sentence_index(corpus):
+    """
+    Input: A corpus saved with the raw sentences (list of [lemma_pos tokens, sentence], see pre_process_corpora.py),
+    either one corpus file or a folder with one processed file per book.
+    Saves an inverted index from every lemma_pos to the ids of the sentences containing it:
+    - vocabulary: all lemma_pos, sorted
+    - postings: sentence ids of word i are postings[offsets[i]:offsets[i + 1]] (sorted)
+    - lengths: number of tokens of each sentence
+    - tokens: the tokens of all sentences (as vocabulary positions) one after the other
+    - books, book_ids: names of the book files and the book of each sentence
+    - text_offsets: position of each sentence in the sentence text file (one cleaned sentence per line)
+    """
+    start = time.perf_counter()
+    index_file, text_file = index_files(corpus)
+    books = corpus_books(corpus)
+
+    word_ids = {}
+    tokens = []
+    lengths = []
+    book_ids = []
+    text_offsets = []
+    with open(text_file, 'wb') as text:
+        for book_id, book in enumerate(books):
+            with open(book, 'r', encoding='utf-8') as f:
+                sent_list = json.load(f)
+            for sent_tokens, sentence in sent_list:
+                tokens.extend(word_ids.setdefault(token, len(word_ids)) for token in sent_tokens)
+                lengths.append(len(sent_tokens))
+                book_ids.append(book_id)
+                text_offsets.append(text.tell())
+                text.write((re.sub(r'\s+', ' ', sentence).strip() + "\n").encode("utf-8"))  # get rid of whitespaces
+        text_offsets.append(text.tell())
+
+    # sort the vocabulary alphabetically and renumber the tokens accordingly
+    vocabulary = np.array(list(word_ids))
+    order = np.argsort(vocabulary)
+    new_ids = np.empty(len(order), dtype=np.int32)
+    new_ids[order] = np.arange(len(order))
+    tokens = new_ids[np.array(tokens, dtype=np.int64)]
+    lengths = np.array(lengths, dtype=np.int32)
+
+    # postings: every (word, sentence) pair once, sorted by word and then sentence id
+    token_sentences = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+    pairs = np.unique(tokens.astype(np.int64) * len(lengths) + token_sentences)
+    postings_words = pairs // len(lengths)
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(postings_words, minlength=len(order)))])
+
+    np.savez(index_file, vocabulary=vocabulary[order], offsets=offsets,
+             postings=(pairs % len(lengths)).astype(np.int32), lengths=lengths, tokens=tokens,
+             books=np.array([os.path.basename(book) for book in books]), book_ids=np.array(book_ids, dtype=np.int32),
+             text_offsets=np.array(text_offsets, dtype=np.int64))
+    print(f"Indexed {len(lengths)} sentences of {corpus} in {round(time.perf_counter() - start, 2)} s.")
+
+
+def load_sentence_index(corpus):
+    """
+    Loads the index of a corpus (built first if it does not exist yet or is older than the corpus) as dictionary.
+    """
+    index_file, text_file = index_files(corpus)
+    corpus_time = max(os.path.getmtime(book) for book in corpus_books(corpus))
+    if not os.path.exists(index_file) or os.path.getmtime(index_file) < corpus_time:
+        build_sentence_index(corpus)
+    with np.load(index_file) as data:
+        index = {key: data[key] for key in data.files}
+    index["token_offsets"] = np.concatenate([[0], np.cumsum(index["lengths"], dtype=np.int64)])
+    index["text_file"] = text_file
+    return index
+
+
+def word_position(index, word):
+    """
+    Returns the position of the word in the vocabulary of the index, None if the word does not appear in the corpus.
+    """
+    position = np.searchsorted(index["vocabulary"], word)
+    if position == len(index["vocabulary"]) or index["vocabulary"][position] != word:
+        return None
+    return position
+
+
+def sentence_ids(index, word, min_length=6, max_length=39):
+    """
+    Returns the ids of all sentences which contain the word and have between min_length and max_length tokens.
+    """
+    position = word_position(index, word)
+    if position is None:
+        return np.array([], dtype=np.int32)
+    ids = index["postings"][index["offsets"][position]:index["offsets"][position + 1]]
+    return ids[(index["lengths"][ids] >= min_length) & (index["lengths"][ids] <= max_length)]
+
+
+def sentence_tokens(index, sent_id):
+    """
+    Returns the tokens of a sentence as vocabulary positions.
+    """
+    return index["tokens"][index["token_offsets"][sent_id]:index["token_offsets"][sent_id + 1]]
+
+
+def word_occurrences(index, word, min_length=6, max_length=39):
+    """
+    Yields (sentence id, token position) for every occurrence of the word in the sentences of allowed length.
+    """
+    position = word_position(index, word)
+    for sent_id in sentence_ids(index, word, min_length, max_length):
+        for token_position in np.flatnonzero(sentence_tokens(index, sent_id) == position):
+            yield sent_id, token_position
+
+
+def reservoir_sample(items, k, rng):
+    """
+    Uniform random sample of k items of an iterable of unknown length which keeps only k items in memory.
+    """
+    reservoir = []
+    for n, item in enumerate(items):
+        if n < k:
+            reservoir.append(item)
+        else:
+            replace = rng.integers(0, n + 1)
+            if replace < k:
+                reservoir[replace] = item
+    return reservoir
+
+
+def read_sentences(index, ids):
+    """
+    Reads the (cleaned) sentences with the given ids from the sentence text file.
+    """
+    sentences = []
+    with open(index["text_file"], 'rb') as text:
+        for sent_id in ids:
+            text.seek(index["text_offsets"][sent_id])
+            sentences.append(text.read(index["text_offsets"][sent_id + 1] - index["text_offsets"][sent_id])
+                             .decode("utf-8").rstrip("\n"))
+    return sentences
+
+
+def sample_sentences(index, word, num=10, rng=None, min_length=6, max_length=39):
+    """
+    Returns up to num random sentences which contain the word (not too short sentences but also not whole paragraphs).
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    ids = sentence_ids(index, word, min_length, max_length)
+    if len(ids) > num:
+        ids = np.sort(rng.choice(ids, size=num, replace=False))
+    return read_sentences(index, ids)
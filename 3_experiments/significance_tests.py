@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Seraina Betschart
+# date: 01.12.2024
+# Bachelor Thesis
+# Detecting Semantic Shift with Word Embeddings
+
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.stats import rankdata
+
+
+def rowwise_pearson(x, y):
+    """
+    Pearson correlation between row i of x and row i of y for all rows at once.
+    """
+    x = x - x.mean(axis=1, keepdims=True)
+    y = y - y.mean(axis=1, keepdims=True)
+    return np.einsum("ij,ij->i", x, y) / np.sqrt(np.einsum("ij,ij->i", x, x) * np.einsum("ij,ij->i", y, y))
+
+
+def resampled_indices(rng, n_resamples, n, batch_size):
+    """
+    Yields matrices of bootstrap indices (each row one resample of size n drawn with replacement), batch_size rows at
+    a time so the memory stays bounded.
+    """
+    for start in range(0, n_resamples, batch_size):
+        yield rng.integers(0, n, size=(min(batch_size, n_resamples - start), n))
+
+
+def permuted_indices(rng, n_resamples, n, batch_size):
+    """
+    Yields matrices of permutations of range(n) (one per row), batch_size rows at a time.
+    """
+    for start in range(0, n_resamples, batch_size):
+        yield rng.permuted(np.tile(np.arange(n), (min(batch_size, n_resamples - start), 1)), axis=1)
+
+
+def confidence_interval(values, confidence):
+    """
+    Percentile interval of the resampled statistics.
+    """
+    return np.nanpercentile(values, [50 * (1 - confidence), 50 * (1 + confidence)])
+
+
+def spearman_significance(x, y, n_resamples=10000, confidence=0.95, seed=42, batch_size=1000):
+    """
+    Spearman correlation of two paired score lists with a bootstrap confidence interval and a two-sided permutation test
+    p-value. All resamples of a batch are ranked and correlated in one operation. Pairs with a missing score (nan) are
+    left out.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    keep = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[keep], y[keep]
+    rng = np.random.default_rng(seed)
+    rank_x, rank_y = rankdata(x), rankdata(y)
+    observed = rowwise_pearson(rank_x[None, :], rank_y[None, :])[0]
+
+    bootstrap = np.concatenate([rowwise_pearson(rankdata(x[indices], axis=1), rankdata(y[indices], axis=1))
+                                for indices in resampled_indices(rng, n_resamples, len(x), batch_size)])
+    # the ranks do not change when the pairs are shuffled, so only the ranks of y are permuted
+    permuted = np.concatenate([rowwise_pearson(np.broadcast_to(rank_x, indices.shape), rank_y[indices])
+                               for indices in permuted_indices(rng, n_resamples, len(x), batch_size)])
+    low, high = confidence_interval(bootstrap, confidence)
+    return {"statistic": float(observed), "ci_low": float(low), "ci_high": float(high),
+            "p_value": float((np.sum(np.abs(permuted) >= abs(observed)) + 1) / (n_resamples + 1)), "n": len(x)}
+
+
+def mean_difference_significance(a, b, n_resamples=10000, confidence=0.95, seed=42, batch_size=1000):
+    """
+    Difference of the means of two groups (a - b) with a bootstrap confidence interval (both groups resampled on their
+    own) and a two-sided permutation test p-value (group labels shuffled).
+    """
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    a, b = a[~np.isnan(a)], b[~np.isnan(b)]
+    rng = np.random.default_rng(seed)
+    observed = a.mean() - b.mean()
+
+    bootstrap = np.concatenate([a[indices_a].mean(axis=1) - b[indices_b].mean(axis=1) for indices_a, indices_b in
+                                zip(resampled_indices(rng, n_resamples, len(a), batch_size),
+                                    resampled_indices(rng, n_resamples, len(b), batch_size))])
+    pooled = np.concatenate([a, b])
+    permuted = np.concatenate([pooled[indices[:, :len(a)]].mean(axis=1) - pooled[indices[:, len(a):]].mean(axis=1)
+                               for indices in permuted_indices(rng, n_resamples, len(pooled), batch_size)])
+    low, high = confidence_interval(bootstrap, confidence)
+    return {"statistic": float(observed), "ci_low": float(low), "ci_high": float(high),
+            "p_value": float((np.sum(np.abs(permuted) >= abs(observed)) + 1) / (n_resamples + 1)),
+            "n": [len(a), len(b)]}
+
+
+TESTS = {"spearman": spearman_significance, "mean_difference": mean_difference_significance}
+
+
+def run_test(comparison):
+    """
+    Runs one comparison given as (name, test, scores 1, scores 2, options).
+    """
+    name, test, scores1, scores2, options = comparison
+    return name, TESTS[test](scores1, scores2, **options)
+
+
+def run_comparisons(comparisons, n_jobs=3):
+    """
+    Runs several comparisons (name, "spearman" or "mean_difference", scores 1, scores 2, dictionary of options) in
+    parallel processes and returns the results as dictionary name -> result.
+    """
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        return dict(executor.map(run_test, comparisons))
+
+
+def print_result(name, result, confidence=0.95):
+    """
+    Prints the statistic with its confidence interval and p-value.
+    """
+    print(f"{name}: {round(result['statistic'], 4)} "
+          f"({int(confidence * 100)}% CI {round(result['ci_low'], 4)} to {round(result['ci_high'], 4)}), "
+          f"permutation p-value {round(result['p_value'], 5)}, n = {result['n']}")